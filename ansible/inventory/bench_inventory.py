@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""Benchmarks for terraform_state_inventory.py against synthetic bpg states.
+
+Not part of the inventory contract — Ansible never runs this. It generates
+states shaped like what `terragrunt state pull` returns for our projects
+(containers + VMs with nested initialization blocks, tags, and a tunable
+amount of provider-attribute bloat) and measures the inventory code on them.
+
+Usage:
+  python3 inventory/bench_inventory.py memory [--hosts 500] [--bloat-kb 16]
+      Peak Python memory + wall time of decoding one multi-megabyte state:
+      whole-document json.loads alone, the inventory's projection of it
+      (the path below INVENTORY_STREAM_MB) and the streaming projection
+      parser it switches to above that.
+
+  python3 inventory/bench_inventory.py coldstart [--hosts 1000] [--runs 20]
+      Process start-to-exit time of `--list` and `--host` as Ansible runs
+      them, against a fake terragrunt serving synthetic states: from warm
+      cache entries, from the snapshot file (`--host` only), and uncached.
+      `python3 -c pass` is printed alongside as the interpreter floor.
+
+  python3 inventory/bench_inventory.py suite [--sizes 10,1000,10000]
+          [--vm-share 0.1] [--tags 3] [--bloat-kb 4] [--runs 3]
+          [--save FILE] [--baseline FILE] [--threshold 0.25]
+      Median wall time and peak RSS of full uncached `--list`, `--host` and
+      `--doctor` (probes off) processes per state size, with terragrunt
+      stubbed by a local fake. --save writes the results as JSON; with
+      --baseline, any case more than --threshold slower or bigger than the
+      saved run fails the command (exit 1). Backs `make inventory-bench`.
+
+  python3 inventory/bench_inventory.py serve-s3 --root DIR [--port 9000]
+          [--access-key KEY --secret SECRET]
+      A minimal local S3 stand-in for the direct backend reader: serves
+      DIR/<bucket>/<key> to path-style GETs over keep-alive HTTP/1.1, with
+      ETags and 304s for If-None-Match, and (given a key pair) verifies the
+      SigV4 signature. Point the inventory at it with
+      INVENTORY_BACKEND=direct INVENTORY_S3_ENDPOINT=http://127.0.0.1:9000.
+      `--synthetic N` first writes an N-host state for every project.
+
+  python3 inventory/bench_inventory.py facts [--hosts 20] [--runs 3]
+      Play start-up time (needs ansible-playbook): a short play reading
+      ansible_facts on every synthetic host, with `gather_facts: true` and
+      an empty fact cache vs `gather_facts: false` with the inventory
+      pre-warming it from state (INVENTORY_FACT_CACHE=1) in the same run.
+      Hosts are forced to ansible_connection=local so no SSH is involved;
+      over SSH the gathered case only gets slower.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import terraform_state_inventory as tsi  # noqa: E402  (needs the path above)
+
+LXC_PROJECT = {"path": "../../terraform/lxc", "group": "lxc_containers", "user": "maintainer"}
+
+# Stands in for terragrunt: `state pull` prints $BENCH_STATES/<project dir name>.json.
+FAKE_TERRAGRUNT = """#!{python}
+import os, shutil, sys
+with open(os.path.join(os.environ["BENCH_STATES"], os.path.basename(os.getcwd()) + ".json"), "rb") as fh:
+    shutil.copyfileobj(fh, sys.stdout.buffer)
+"""
+
+
+def synthetic_state(containers: int, vms: int = 0, tags: int = 3,
+                    bloat_bytes: int = 0, serial: int = 1) -> dict[str, Any]:
+    """A bpg-shaped state: one for_each resource per type, plus non-host noise.
+
+    `bloat_bytes` pads every instance with provider attributes the inventory
+    never reads (description, a sensitive-looking blob), which is where real
+    states get big. VMs are numbered after the containers, so every VMID
+    and address belongs to one host, as in a real cluster.
+    """
+    def instance(i: int, kind: str) -> dict[str, Any]:
+        name = f"{kind}-{i}"
+        n = i if kind == "ct" else containers + i
+        return {
+            "index_key": name,
+            "schema_version": 0,
+            "attributes": {
+                "vm_id": 1000 + n,
+                "node_name": f"pve{i % 3 + 1}",
+                "tags": [f"tag-{(i + t) % 17}" for t in range(tags)],
+                "initialization": [{
+                    "hostname": name,
+                    "ip_config": [{"ipv4": [{
+                        "address": f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}/24",
+                        "gateway": "10.0.0.1",
+                    }]}],
+                    "user_account": [{"keys": ["ssh-ed25519 AAAA..."], "password": "x"}],
+                }],
+                "description": "Managed by Terraform." + "x" * (bloat_bytes // 2),
+                "cpu": [{"cores": 2, "units": 1024}],
+                "memory": [{"dedicated": 1024, "swap": 512}],
+                "network_interface": [{"name": "eth0", "bridge": "vmbr0", "vlan_id": 10}],
+            },
+            "sensitive_attributes": [],
+            "private": "eyJ" + "A" * (bloat_bytes - bloat_bytes // 2),
+        }
+
+    resources = [
+        {
+            "module": "module.lxc[0]", "mode": "managed",
+            "type": "proxmox_virtual_environment_container", "name": "container",
+            "provider": 'provider["registry.opentofu.org/bpg/proxmox"]',
+            "instances": [instance(i, "ct") for i in range(containers)],
+        },
+        {
+            "module": "module.talos[0]", "mode": "managed",
+            "type": "proxmox_virtual_environment_vm", "name": "vm",
+            "provider": 'provider["registry.opentofu.org/bpg/proxmox"]',
+            "instances": [instance(i, "vm") for i in range(vms)],
+        },
+        {
+            "module": "module.lxc[0]", "mode": "managed",
+            "type": "tls_private_key", "name": "ssh",
+            "provider": 'provider["registry.opentofu.org/hashicorp/tls"]',
+            "instances": [
+                {"index_key": f"ct-{i}", "attributes": {"private_key_openssh": "K" * 400}}
+                for i in range(containers)
+            ],
+        },
+    ]
+    return {
+        "version": 4, "terraform_version": "1.8.0", "serial": serial,
+        "lineage": "00000000-bench", "outputs": {}, "resources": resources,
+        "check_results": None,
+    }
+
+
+def measure(fn: Callable[[], Any]) -> tuple[float, int, Any]:
+    """(wall seconds, peak traced bytes, result) of one call."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def write_states(statedir: Path, make_states: Callable[[], dict[str, dict[str, Any]]]) -> None:
+    """Generate and write states in a forked child.
+
+    Every measured process is forked from this one and its peak RSS counts
+    whatever it inherited at fork time, so the big state dicts must never
+    live here.
+    """
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            for name, state in make_states().items():
+                (statedir / f"{name}.json").write_text(json.dumps(state))
+            status = 0
+        finally:
+            os._exit(status)
+    if os.waitpid(pid, 0)[1] != 0:
+        raise SystemExit("generating synthetic states failed")
+
+
+def fake_environment(workdir: Path, make_states: Callable[[], dict[str, dict[str, Any]]]) -> dict[str, str]:
+    """Env for running the inventory against make_states() (project dir name -> state)."""
+    bindir = workdir / "bin"
+    bindir.mkdir()
+    terragrunt = bindir / "terragrunt"
+    terragrunt.write_text(FAKE_TERRAGRUNT.format(python=sys.executable))
+    terragrunt.chmod(0o755)
+    statedir = workdir / "states"
+    statedir.mkdir()
+    write_states(statedir, make_states)
+    tmpdir = workdir / "tmp"
+    tmpdir.mkdir()
+    env = dict(os.environ)
+    env.update({
+        "PATH": f"{bindir}{os.pathsep}{env.get('PATH', '')}",
+        "BENCH_STATES": str(statedir),
+        "TMPDIR": str(tmpdir),
+        "INVENTORY_DAEMON": "0",
+    })
+    return env
+
+
+def time_runs(argv: list[str], env: dict[str, str], runs: int) -> list[float]:
+    """Wall seconds of `runs` fresh processes of argv."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run_measured(argv: list[str], env: dict[str, str]) -> tuple[float, int]:
+    """(wall seconds, peak RSS bytes) of one process of argv, whatever its exit code."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, _, usage = os.wait4(proc.pid, 0)
+    proc.returncode = 0  # reaped above; keep Popen from waiting again
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return elapsed, rss
+
+
+def cmd_suite(args: argparse.Namespace) -> int:
+    script = str(SCRIPT_DIR / "terraform_state_inventory.py")
+    cases = {
+        "list": ["--list"],
+        "host": ["--host", "ct-0"],
+        "doctor": ["--doctor"],
+    }
+    results: dict[str, dict[str, float]] = {}
+    print(f"{'case':<16}{'state':>9}{'wall':>10}{'peak rss':>11}")
+    for size in args.sizes:
+        vms = round(size * args.vm_share)
+
+        def states() -> dict[str, dict[str, Any]]:
+            return {
+                "lxc": synthetic_state(size - vms, vms=vms, tags=args.tags,
+                                       bloat_bytes=args.bloat_kb * 1024),
+                "talos": synthetic_state(0),
+            }
+
+        with tempfile.TemporaryDirectory(prefix="bench-inventory-") as workdir:
+            env = fake_environment(Path(workdir), states)
+            # Every run is a full pull + build: no cache, memo or snapshot reuse.
+            env.update(INVENTORY_INCREMENTAL="0", INVENTORY_SNAPSHOT_TTL="0", INVENTORY_PROBE="0")
+            env.pop("INVENTORY_CACHE", None)
+            megabytes = sum(p.stat().st_size for p in Path(workdir, "states").iterdir()) / 1e6
+            for name, flags in cases.items():
+                samples = [run_measured([sys.executable, script, *flags], env)
+                           for _ in range(args.runs)]
+                wall = statistics.median(t for t, _ in samples)
+                rss = max(r for _, r in samples)
+                results[f"{name}@{size}"] = {"wall": wall, "rss": rss}
+                print(f"{name + '@' + str(size):<16}{megabytes:>7.1f}MB"
+                      f"{wall * 1000:>8.0f}ms{rss / 1e6:>9.1f}MB")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    if not args.baseline:
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text())
+    regressions = []
+    for case, now in sorted(results.items()):
+        before = baseline.get(case)
+        if before is None:
+            continue
+        for metric in ("wall", "rss"):
+            if now[metric] > before[metric] * (1 + args.threshold):
+                regressions.append(
+                    f"{case} {metric}: {before[metric]:.4g} -> {now[metric]:.4g} "
+                    f"(+{now[metric] / before[metric] - 1:.0%})"
+                )
+    for line in regressions:
+        print(f"REGRESSION: {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def cmd_serve_s3(args: argparse.Namespace) -> int:
+    import hashlib
+    import re
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import unquote
+
+    root = Path(args.root).resolve()
+    if args.synthetic:
+        for project in tsi.discover_projects():
+            config = tsi.backend_config((SCRIPT_DIR / project["path"]).resolve())
+            target = root / config["bucket"] / config["key"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(json.dumps(synthetic_state(args.synthetic)))
+
+    class S3Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, as the reader expects
+        disable_nagle_algorithm = True  # headers and body are separate writes
+
+        def reply(self, status: int, body: bytes = b"", **headers: str) -> None:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name.replace("_", "-"), value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def error(self, status: int, code: str) -> None:
+            self.reply(status, f"<Error><Code>{code}</Code></Error>".encode(),
+                       Content_Type="application/xml")
+
+        def authorized(self) -> bool:
+            auth = self.headers.get("Authorization", "")
+            if not auth.startswith("AWS4-HMAC-SHA256 "):
+                return False
+            if not args.secret:
+                return True
+            match = re.search(r"Credential=([^/]+)/\d{8}/([^/]+)/s3/aws4_request, "
+                              r"SignedHeaders=([^,]+)", auth)
+            if match is None or match.group(1) != args.access_key:
+                return False
+            names = set(match.group(3).split(";")) - {"host", "x-amz-content-sha256",
+                                                       "x-amz-date", "x-amz-security-token"}
+            expected = tsi.sign_request(
+                "GET", self.headers["Host"], self.path, match.group(2),
+                (args.access_key, args.secret, self.headers.get("x-amz-security-token", "")),
+                self.headers.get("x-amz-date", ""), {n: self.headers.get(n, "") for n in names},
+            )
+            return expected["authorization"] == auth
+
+        def do_GET(self) -> None:
+            if not self.authorized():
+                return self.error(403, "SignatureDoesNotMatch")
+            path = (root / unquote(self.path).lstrip("/")).resolve()
+            if root not in path.parents or not path.is_file():
+                return self.error(404, "NoSuchKey")
+            body = path.read_bytes()
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self.reply(304, ETag=etag)
+            self.reply(200, body, ETag=etag, Content_Type="application/json")
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), S3Handler)
+    print(f"serving {root} as S3 on http://127.0.0.1:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+FACTS_PLAY = """\
+- hosts: lxc_containers
+  gather_facts: {gather}
+  tasks:
+    - name: Use state-derived facts
+      ansible.builtin.debug:
+        msg: "{{{{ ansible_facts.hostname }}}}: {{{{ ansible_facts.processor_vcpus }}}} vCPU"
+"""
+
+
+def cmd_facts(args: argparse.Namespace) -> int:
+    if shutil.which("ansible-playbook") is None:
+        print("ansible-playbook not found on PATH", file=sys.stderr)
+        return 1
+    script = str(SCRIPT_DIR / "terraform_state_inventory.py")
+
+    def states() -> dict[str, dict[str, Any]]:
+        return {"lxc": synthetic_state(args.hosts), "talos": synthetic_state(0)}
+
+    with tempfile.TemporaryDirectory(prefix="bench-inventory-") as workdir:
+        env = fake_environment(Path(workdir), states)
+        facts = Path(workdir) / "facts"
+        # Run from ansible/ with its ansible.cfg, as the Makefile does; only
+        # the fact cache is redirected so the real .ansible_facts is untouched.
+        env.update({
+            "ANSIBLE_CACHE_PLUGIN": "jsonfile",
+            "ANSIBLE_CACHE_PLUGIN_CONNECTION": str(facts),
+            "ANSIBLE_GATHERING": "smart",
+            "INVENTORY_CACHE": "1",
+            "INVENTORY_CACHE_TTL": "3600",
+        })
+        cases = []
+        for name, gather, warm in (("setup", "true", "0"), ("pre-warmed", "false", "1")):
+            play = Path(workdir) / f"{name}.yml"
+            play.write_text(FACTS_PLAY.format(gather=gather))
+            argv = ["ansible-playbook", "-i", script, str(play), "-e", "ansible_connection=local"]
+            cases.append((name, argv, dict(env, INVENTORY_FACT_CACHE=warm)))
+
+        print(f"{args.hosts} hosts, {args.runs} runs each (connection=local)")
+        print(f"{'case':<14}{'median':>10}{'min':>10}")
+        for name, argv, case_env in cases:
+            samples = []
+            for _ in range(args.runs):
+                shutil.rmtree(facts, ignore_errors=True)
+                started = time.perf_counter()
+                subprocess.run(argv, env=case_env, cwd=SCRIPT_DIR.parent,
+                               stdout=subprocess.DEVNULL, check=True)
+                samples.append(time.perf_counter() - started)
+            print(f"{name:<14}{statistics.median(samples):>9.2f}s{min(samples):>9.2f}s")
+    return 0
+
+
+def cmd_coldstart(args: argparse.Namespace) -> int:
+    def states() -> dict[str, dict[str, Any]]:
+        return {"lxc": synthetic_state(args.hosts), "talos": synthetic_state(0, vms=6)}
+
+    script = str(SCRIPT_DIR / "terraform_state_inventory.py")
+    with tempfile.TemporaryDirectory(prefix="bench-inventory-") as workdir:
+        env = fake_environment(Path(workdir), states)
+        cached = dict(env, INVENTORY_CACHE="1", INVENTORY_CACHE_TTL="3600")
+        # Prime the per-project cache entries (and the snapshot) once.
+        subprocess.run([sys.executable, script], env=cached, stdout=subprocess.DEVNULL, check=True)
+        cases = [
+            ("python3 -c pass", [sys.executable, "-c", "pass"], env),
+            ("--host, snapshot", [sys.executable, script, "--host", "ct-0"],
+             dict(cached, INVENTORY_SNAPSHOT_TTL="3600")),
+            ("--list, cache", [sys.executable, script, "--list"],
+             dict(cached, INVENTORY_SNAPSHOT_TTL="0")),
+            ("--host, cache", [sys.executable, script, "--host", "ct-0"],
+             dict(cached, INVENTORY_SNAPSHOT_TTL="0")),
+            ("--list, no cache", [sys.executable, script, "--list"],
+             dict(env, INVENTORY_SNAPSHOT_TTL="0")),
+        ]
+        print(f"state: {args.hosts} containers + 6 VMs, {args.runs} runs each")
+        print(f"{'case':<20}{'median':>10}{'min':>10}")
+        for name, argv, case_env in cases:
+            samples = time_runs(argv, case_env, args.runs)
+            print(f"{name:<20}{statistics.median(samples) * 1000:>8.1f}ms"
+                  f"{min(samples) * 1000:>8.1f}ms")
+    return 0
+
+
+def cmd_memory(args: argparse.Namespace) -> int:
+    raw = json.dumps(synthetic_state(args.hosts, bloat_bytes=args.bloat_kb * 1024)).encode()
+
+    def whole_document() -> Any:
+        return tsi.hosts_from_state(json.loads(io.BytesIO(raw).read()), LXC_PROJECT)
+
+    def projected() -> Any:
+        state = tsi.project_state(io.BytesIO(raw), stream_above=len(raw))
+        return tsi.hosts_from_state(state, LXC_PROJECT)
+
+    def streaming() -> Any:
+        return tsi.hosts_from_state(tsi.project_state(io.BytesIO(raw), stream_above=0), LXC_PROJECT)
+
+    print(f"state: {args.hosts} hosts, {len(raw) / 1e6:.1f} MB")
+    print(f"{'parser':<16}{'wall':>10}{'peak mem':>12}{'hosts':>8}")
+    results = []
+    for name, fn in (("json.loads", whole_document), ("projected", projected), ("streaming", streaming)):
+        elapsed, peak, hosts = measure(fn)
+        results.append(hosts)
+        print(f"{name:<16}{elapsed * 1000:>8.0f}ms{peak / 1e6:>10.1f}MB{len(hosts):>8}")
+    if any(hosts != results[0] for hosts in results[1:]):
+        print("MISMATCH: the parsers derived different hosts", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    memory = sub.add_parser("memory", help="peak memory of whole-document vs streaming decode")
+    memory.add_argument("--hosts", type=int, default=500, help="containers in the state (default: 500)")
+    memory.add_argument("--bloat-kb", type=int, default=16,
+                        help="unread provider attributes per instance, KiB (default: 16)")
+    memory.set_defaults(func=cmd_memory)
+
+    coldstart = sub.add_parser("coldstart", help="process wall time of --list/--host with a warm cache")
+    coldstart.add_argument("--hosts", type=int, default=1000, help="containers in the state (default: 1000)")
+    coldstart.add_argument("--runs", type=int, default=20, help="processes per case (default: 20)")
+    coldstart.set_defaults(func=cmd_coldstart)
+
+    suite = sub.add_parser("suite", help="wall + peak RSS of --list/--host/--doctor across state sizes")
+    suite.add_argument("--sizes", type=lambda v: [int(n) for n in v.split(",")], default=[10, 1000, 10000],
+                       help="comma-separated host counts (default: 10,1000,10000)")
+    suite.add_argument("--vm-share", type=float, default=0.1, help="fraction of hosts that are VMs (default: 0.1)")
+    suite.add_argument("--tags", type=int, default=3, help="Proxmox tags per host (default: 3)")
+    suite.add_argument("--bloat-kb", type=int, default=4,
+                       help="unread provider attributes per instance, KiB (default: 4)")
+    suite.add_argument("--runs", type=int, default=3, help="processes per case (default: 3)")
+    suite.add_argument("--save", metavar="FILE", help="write results as JSON")
+    suite.add_argument("--baseline", metavar="FILE", help="fail on regressions against a saved run")
+    suite.add_argument("--threshold", type=float, default=0.25,
+                       help="allowed slowdown/growth vs baseline (default: 0.25 = 25%%)")
+    suite.set_defaults(func=cmd_suite)
+
+    serve_s3 = sub.add_parser("serve-s3", help="local S3 stand-in for INVENTORY_BACKEND=direct")
+    serve_s3.add_argument("--root", required=True, help="directory holding <bucket>/<key> objects")
+    serve_s3.add_argument("--port", type=int, default=9000, help="listen port on 127.0.0.1 (default: 9000)")
+    serve_s3.add_argument("--access-key", default="", help="verify SigV4 signatures for this key id")
+    serve_s3.add_argument("--secret", default="", help="secret for --access-key")
+    serve_s3.add_argument("--synthetic", type=int, default=0, metavar="N",
+                          help="first write an N-host synthetic state for every project")
+    serve_s3.set_defaults(func=cmd_serve_s3)
+
+    facts = sub.add_parser("facts", help="play start-up with gathered vs state pre-warmed facts")
+    facts.add_argument("--hosts", type=int, default=20, help="containers in the state (default: 20)")
+    facts.add_argument("--runs", type=int, default=3, help="playbook runs per case (default: 3)")
+    facts.set_defaults(func=cmd_facts)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,31 +17,151 @@
   ansible-inventory -i inventory/terraform_state_inventory.py --host komodo
 
 Operational extras (do not affect the emitted inventory contract):
-  INVENTORY_CACHE=1    Cache each project's pulled state to a tempfile for
-                       INVENTORY_CACHE_TTL seconds (default 60) so a burst of
-                       ansible runs doesn't re-pull from R2 every time. Default
-                       off — live pull is the proven path.
+  INVENTORY_CACHE=1    Reuse each project's cache entry (below) for
+                       INVENTORY_CACHE_TTL seconds (default 60) without pulling
+                       at all, so a burst of ansible runs doesn't re-pull from
+                       R2 every time. Default off — live pull is the proven
+                       path. A per-project lock lets one process refresh while
+                       concurrent misses wait for its result. For a further
+                       INVENTORY_CACHE_STALE seconds (default 300) past the TTL
+                       the old entry is served at once while a single detached
+                       process refreshes it. --cache-stats prints the
+                       hit/stale/miss/refresh counters.
+  INVENTORY_INCREMENTAL=0
+                       Ignore the cache entry's serial/lineage. By default each
+                       project's last state serial + lineage and the final host
+                       records (hostvars, facts, group memberships) derived from
+                       it are kept in a small versioned marshal file; the next
+                       pull reads only the state header and, when neither moved,
+                       stops there and reuses the entry instead of decoding +
+                       re-deriving the whole state. Entries are written
+                       atomically.
+  INVENTORY_STREAM_MB=64
+                       Pulls up to this size are decoded whole with
+                       json.loads; bigger ones are stream-decoded, keeping
+                       only the host attributes the inventory reads, so peak
+                       memory follows the host count instead of the state
+                       size (slower per byte). 0 always streams.
+  Projects             Every directory under terraform/ (INVENTORY_TF_ROOT
+                       overrides) holding a terragrunt.hcl is pulled, at most
+                       INVENTORY_WORKERS (default 8) at a time, each killed
+                       after INVENTORY_PULL_TIMEOUT seconds (default 60). When a
+                       pull fails or times out, that project's hosts come from
+                       its last cache entry (above) and are also put in the
+                       group inventory_stale, instead of disappearing.
   --doctor             Validate the inventory instead of emitting it: terragrunt
                        present, every host has an ansible_host + a key file that
-                       exists, and no group/host name collisions. Backs
+                       exists, no group/host name collisions and no hosts in
+                       inventory_stale. Then every host is probed concurrently:
+                       a TCP connect to its SSH port (Talos API port 50000
+                       for Talos nodes), reporting per-host latency and
+                       flagging addresses that no longer answer. Probes run
+                       INVENTORY_PROBE_WORKERS (default 64) at a time with an
+                       INVENTORY_PROBE_TIMEOUT of 2s; --no-probe or
+                       INVENTORY_PROBE=0 skips them. Backs
                        `make inventory-doctor`. Exits non-zero on any problem.
+  --group NAME         Print one group ({"hosts": [...]}) instead of the list.
+  --managed            Print every guest already in Terraform state as
+                       {"guests": {VMID: {address, node, project}}, "stale",
+                       "unavailable"}, Talos VMs included, from the same
+                       per-project cache entries. import_proxmox.py uses it to
+                       skip managed guests before calling the Proxmox API.
+  --by-ip ADDR, --by-vmid ID
+                       Print {hostname: hostvars} for the host with that
+                       ansible_host / Proxmox VMID ({} when none matches).
+  INVENTORY_FACT_CACHE=1
+                       On every build, also write minimal per-host entries into
+                       Ansible's jsonfile fact cache (fact_caching_connection
+                       from ansible.cfg; or give a directory instead of 1):
+                       ansible_hostname, ansible_processor_vcpus,
+                       ansible_memtotal_mb and proxmox_* facts (IP, tags,
+                       VMID, node, VLANs) from state. Entries a real setup run
+                       wrote are never touched, and module_setup is not set,
+                       so smart gathering still gathers once for full plays —
+                       plays with `gather_facts: false` get these for free.
+                       --warm-facts does one such build and exits.
+  Composite groups     Every host also joins node_<proxmox node> and, per
+                       tagged NIC, vlan_<id>; COMPOSITE_GROUPS (e.g.
+                       docker_periphery = docker:!komodo) are evaluated once
+                       per build from the group → hosts index, so plays can
+                       target them instead of intersection patterns.
+  Change feed          --list also emits the group `changed`: hosts that are new,
+                       or whose ansible_host, proxmox_tags or key path differ,
+                       relative to the baseline inventory saved by
+                       --save-baseline [PATH] (default
+                       $XDG_STATE_HOME/ansible-tfstate/, or INVENTORY_BASELINE);
+                       hosts gone since are its var inventory_removed_hosts.
+                       Without a baseline every host is in it. Save one after a
+                       converge, then `--limit changed` touches only the
+                       difference. --changed-since FILE prints {changed, new,
+                       removed} against any saved inventory (e.g. old --list
+                       output).
+  INVENTORY_SNAPSHOT_TTL=60
+                       Every build persists the inventory plus a hostname/IP/
+                       VMID index to the daemon's private directory (see
+                       --serve). --host, --group, --by-ip and
+                       --by-vmid answer from them without touching terragrunt
+                       while they are younger than this many seconds (0 = off).
+  INVENTORY_BACKEND=direct
+                       Read each project's state object straight from the S3
+                       backend root.hcl configures (bucket, key, endpoint)
+                       instead of running terragrunt: SigV4-signed GETs over a
+                       pooled keep-alive connection, conditional on the ETag
+                       remembered in the cache entry, so an unchanged state
+                       costs one empty 304. Credentials come from
+                       AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY or the config's
+                       profile in ~/.aws/credentials; INVENTORY_S3_ENDPOINT
+                       overrides the
+                       endpoint (e.g. `bench_inventory.py serve-s3`, a local
+                       stand-in). Any config it does not understand, and any
+                       failed read, falls back to terragrunt.
+  INVENTORY_TRACE=1    Time each phase of resolution and print a summary table
+                       to stderr on exit: resolve, build, per-project cache
+                       check and "stack" (pull → decode → project), group,
+                       snapshot and emit spans, with cache hit/miss events and
+                       the terragrunt exit status, bytes read, time to first
+                       byte and time blocked on the pipe. Any other non-empty
+                       value is a file that spans are appended to as JSON
+                       lines instead. stdout is never touched; unset, each
+                       span is a no-op.
+  --serve              Run as a resident daemon: keep the built inventory warm in
+                       memory, rebuild it every INVENTORY_REFRESH seconds
+                       (default 30) and answer list/host/group queries on the
+                       Unix socket INVENTORY_SOCKET (default inventory.sock in
+                       the 0700 directory $XDG_RUNTIME_DIR/ansible-tfstate, or
+                       $TMPDIR/ansible-tfstate-<uid>). Backs `make
+                       inventory-daemon`. Every other invocation asks the
+                       daemon first and falls back to an in-process build when
+                       none is listening, or when the socket is not one this
+                       user owns; INVENTORY_DAEMON=0 skips the socket.
 """
 
 from __future__ import annotations
 
-import hashlib
+# Only what a cache hit needs is imported up front. subprocess, tempfile,
+# concurrent.futures, socket(server), threading and fcntl are imported where
+# they are used, so `--list`/`--host` served from cache start measurably faster.
+import _thread
+import itertools
 import json
+import marshal
 import os
-import subprocess
+import re
+import stat
 import sys
-import tempfile
 import time
-from concurrent.futures import ThreadPoolExecutor
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
-# Repo-relative Terraform projects. Each is pulled via Terragrunt.
 SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Terraform projects are discovered: every directory under terraform/ holding a
+# terragrunt.hcl is pulled via Terragrunt (discover_projects()). Settings for
+# the known ones, keyed by their path under terraform/; any other project gets
+# a group named after its path and connects as root.
+#
 # `user` is the STEADY-STATE connection user (post-bootstrap). It becomes the
 # per-host `ansible_user`, which OUTRANKS `remote_user`/`--user` in Ansible's
 # precedence. Bootstrap is the only play that needs root, so 01-bootstrap.yml
@@ -49,10 +169,18 @@
 # to actually force the root connection — `--user root` alone does not. Setting
 # maintainer here makes every other play (configure, periphery, updates, …) connect
 # correctly by default.
-PROJECTS: list[dict[str, Any]] = [
-    {"path": "../../terraform/lxc", "group": "lxc_containers", "user": "maintainer"},
-    {"path": "../../terraform/talos", "group": "talos_cluster", "talos": True},
-]
+PROJECT_SETTINGS: dict[str, dict[str, Any]] = {
+    "lxc": {"group": "lxc_containers", "user": "maintainer"},
+    "talos": {"group": "talos_cluster", "talos": True},
+}
+TF_ROOT = SCRIPT_DIR / "../../terraform"
+# Never descended into while discovering: Terraform modules, plus hidden
+# (.terragrunt-cache, .terraform) and _-prefixed (_backend-examples) dirs.
+SKIP_DIRS = {"modules"}
+
+# Hosts of a project whose pull failed are served from its last-known-good
+# cache entry and additionally put in this group.
+STALE_GROUP = "inventory_stale"
 
 # bpg resource types we turn into hosts.
 HOST_TYPES = {
@@ -61,54 +189,818 @@
 }
 
 
-def _cache_path(project: dict[str, Any]) -> Path:
-    """Stable tempfile path for one project's cached state."""
-    key = hashlib.sha256(project["path"].encode()).hexdigest()[:16]
-    return Path(tempfile.gettempdir()) / f"ansible-tfstate-{key}.json"
+# The only instance attributes host_from_instance()/host_facts() read. The pull
+# is decoded as a stream and everything else — other resource types, provider
+# attributes, sensitive blobs — is skipped without ever being materialized.
+PROJECTED_ATTRS = {
+    "initialization", "ipv4", "tags", "vm_id",
+    "node_name", "network_interface", "network_device", "cpu", "memory",
+}
+
+# Composite groups, precomputed once per build from the group → hosts index
+# instead of being re-evaluated by every play's host pattern. Values use
+# Ansible's pattern syntax over any group (tags, projects, node_*, vlan_*):
+# `a:b` union, `a:&b` intersection, `a:!b` difference, left to right.
+COMPOSITE_GROUPS: dict[str, str] = {
+    # Komodo Periphery targets (playbooks/komodo/periphery.yml).
+    "docker_periphery": "docker:!komodo",
+}
+# Every host also joins NODE_GROUP_PREFIX + its Proxmox node and, per tagged
+# NIC, VLAN_GROUP_PREFIX + the VLAN id.
+NODE_GROUP_PREFIX = "node_"
+VLAN_GROUP_PREFIX = "vlan_"
+
+# (hostname, hostvars, facts, groups): facts are state attributes that are not
+# emitted as hostvars but are worth indexing (e.g. the VMID); groups are every
+# group the host joins, so a cached entry needs no re-derivation at all.
+HostRecord = tuple[str, dict[str, Any], dict[str, Any], list[str]]
+
+# (vmid, node or None, resource address) of every guest a project manages,
+# hostname or not (Talos VMs have none). --managed serves these to
+# terraform/scripts/import_proxmox.py.
+ManagedRecord = tuple[int, Any, str]
+
+# Bump when HostRecord, ManagedRecord or the entry layout changes. marshal's
+# encoding is tied to the interpreter, so the Python version is part of the tag.
+CACHE_FORMAT = 6
+CACHE_TAG = (CACHE_FORMAT, sys.version_info[:2])
 
 
-def pull_state(project: dict[str, Any]) -> dict[str, Any]:
-    """`terragrunt state pull` for one project; empty dict on any failure.
+def _tmpdir() -> Path:
+    """tempfile.gettempdir(), minus the import on the cache-hit path."""
+    for var in ("TMPDIR", "TEMP", "TMP"):
+        if os.environ.get(var):
+            return Path(os.environ[var])
+    return Path("/tmp")
 
-    With INVENTORY_CACHE=1, a fresh-enough cached copy is reused and a
-    successful pull is written back. The cache is purely a latency optimization
-    — it never changes WHAT is emitted, only how often R2 is hit.
+
+def _private_dir() -> Path | None:
+    """This user's 0700 directory for the daemon socket and snapshots; None if it isn't ours.
+
+    $XDG_RUNTIME_DIR/ansible-tfstate, else $TMPDIR/ansible-tfstate-<uid>. A
+    directory someone else created under that name (or a symlink) is refused
+    rather than trusted.
     """
-    cwd = (SCRIPT_DIR / project["path"]).resolve()
-    if not cwd.exists():
-        return {}
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        path = Path(runtime) / "ansible-tfstate"
+    else:
+        path = _tmpdir() / f"ansible-tfstate-{os.getuid()}"
+    try:
+        path.mkdir(mode=0o700, exist_ok=True)
+        st = path.lstat()
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        return None
+    return path
+
+
+def _cache_path(project: dict[str, Any], kind: str = "cache") -> Path:
+    """Stable tempfile path for one project's cache entry (or its lock)."""
+    key = f"{zlib.crc32(project['path'].encode()):08x}"
+    return _tmpdir() / f"ansible-tfstate-{key}.{kind}"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
 
-    cache_on = os.environ.get("INVENTORY_CACHE") == "1"
-    cache_file = _cache_path(project)
-    if cache_on:
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write via a sibling tempfile + rename, so readers never see a torn file."""
+    # pid + thread id makes the name unique per writer without importing tempfile.
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{_thread.get_ident()}")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
+    try:
+        fd = os.open(tmp, flags, 0o600)
+    except FileExistsError:  # left behind by a crashed writer that had our pid
+        tmp.unlink()
+        fd = os.open(tmp, flags, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def _flock(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """Hold an exclusive flock on `path`; yields False if non-blocking and busy."""
+    import fcntl
+
+    with open(path, "a") as fh:
         try:
-            ttl = int(os.environ.get("INVENTORY_CACHE_TTL", "60"))
-        except ValueError:
-            ttl = 60
-        if cache_file.exists() and (time.time() - cache_file.stat().st_mtime) < ttl:
+            fcntl.flock(fh, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _stats_path(kind: str = "json") -> Path:
+    return _tmpdir() / f"ansible-tfstate-cache-stats.{kind}"
+
+
+def _count(event: str) -> None:
+    """Bump one persistent cache counter (hit/stale/miss/coalesced/refresh)."""
+    try:
+        with _flock(_stats_path("lock")):
             try:
-                return json.loads(cache_file.read_text() or "{}")
-            except json.JSONDecodeError:
-                pass  # fall through to a live pull
-
-    try:
-        out = subprocess.run(
-            ["terragrunt", "state", "pull"],
-            cwd=cwd, capture_output=True, text=True, check=True,
-        ).stdout
-        state = json.loads(out) if out.strip() else {}
-    except (subprocess.CalledProcessError, json.JSONDecodeError) as exc:
-        sys.stderr.write(f"warn: state pull failed for {project['path']}: {exc}\n")
+                stats = json.loads(_stats_path().read_text())
+            except (OSError, json.JSONDecodeError):
+                stats = {}
+            stats[event] = stats.get(event, 0) + 1
+            _atomic_write(_stats_path(), json.dumps(stats, sort_keys=True).encode())
+    except OSError:
+        pass  # counters are diagnostics, never a reason to fail
+    trace_event(f"cache {event}")
+
+
+# Tracing (INVENTORY_TRACE): off, every span() below is a bare yield.
+TRACE = os.environ.get("INVENTORY_TRACE", "")
+_trace_records: list[dict[str, Any]] = []
+_trace_stacks: dict[int, list[int]] = {}
+_trace_ids = itertools.count(1)
+_trace_origin = time.perf_counter()
+
+
+@contextmanager
+def span(name: str, parent: int | None = None, **attrs: Any) -> Iterator[dict[str, Any]]:
+    """Time one phase when tracing; yields a dict the caller may add details to.
+
+    Spans nest per thread; work handed to a pool passes `parent` explicitly.
+    """
+    if not TRACE:
+        yield attrs
+        return
+    stack = _trace_stacks.setdefault(_thread.get_ident(), [])
+    record = {"span": name, "id": next(_trace_ids),
+              "parent": parent if parent is not None else (stack[-1] if stack else None),
+              **attrs}
+    stack.append(record["id"])
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        stack.pop()
+        record["start_ms"] = round((started - _trace_origin) * 1000, 3)
+        record["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        _trace_records.append(record)
+
+
+def current_span() -> int | None:
+    stack = _trace_stacks.get(_thread.get_ident())
+    return stack[-1] if stack else None
+
+
+def trace_event(name: str, **attrs: Any) -> None:
+    """A point-in-time trace record (cache hit, unchanged state, ...)."""
+    if TRACE:
+        _trace_records.append({
+            "event": name, "parent": current_span(),
+            "start_ms": round((time.perf_counter() - _trace_origin) * 1000, 3), **attrs,
+        })
+
+
+def flush_trace() -> None:
+    """Write and clear the collected trace: a stderr table, or JSON lines.
+
+    INVENTORY_TRACE=1 (or "stderr") prints the table; any other value is a
+    file the records are appended to, one JSON object per line.
+    """
+    if not TRACE or not _trace_records:
+        return
+    records = sorted(_trace_records, key=lambda r: r["start_ms"])
+    _trace_records.clear()
+    if TRACE not in ("1", "stderr"):
+        try:
+            with open(TRACE, "a") as fh:
+                fh.writelines(json.dumps(r, sort_keys=True) + "\n" for r in records)
+        except OSError as exc:
+            sys.stderr.write(f"warn: cannot write trace {TRACE}: {exc}\n")
+        return
+    children: dict[int | None, list[dict[str, Any]]] = {}
+    for r in records:
+        children.setdefault(r["parent"], []).append(r)
+    # Depth-first, siblings by start time, so each project's spans stay together.
+    lines = []
+    todo = [(r, 0) for r in reversed(children.pop(None, []))]
+    while todo:
+        r, level = todo.pop()
+        todo.extend((c, level + 1) for c in reversed(children.get(r.get("id"), [])))
+        name = r.get("span") or r["event"]
+        details = " ".join(
+            f"{k}={v}" for k, v in r.items()
+            if k not in ("span", "event", "id", "parent", "start_ms", "ms")
+        )
+        ms = f"{r['ms']:.1f}" if "ms" in r else "·"
+        lines.append(f"  {'  ' * level + name:<32}{ms:>9}  {details}".rstrip())
+    sys.stderr.write("trace: phase                               ms  details\n")
+    sys.stderr.write("\n".join(lines) + "\n")
+
+
+class _TimedReader:
+    """File wrapper recording bytes read and time spent blocked in read()."""
+
+    def __init__(self, fp: Any) -> None:
+        self.fp = fp
+        self.bytes = 0
+        self.wait = 0.0
+        self.first_byte: float | None = None
+
+    def read(self, size: int = -1) -> bytes:
+        started = time.perf_counter()
+        data = self.fp.read(size)
+        self.wait += time.perf_counter() - started
+        if data and self.first_byte is None:
+            self.first_byte = time.perf_counter()
+        self.bytes += len(data)
+        return data
+
+
+_WS = re.compile(rb"[ \t\r\n]*")
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+_SCALAR = re.compile(rb"-?[0-9][0-9.eE+-]*|true|false|null")
+
+
+class JsonStream:
+    """Pull parser over a binary stream, for walking a state without loading it.
+
+    Callers iterate objects/arrays and, per member, either decode the value
+    (value()) or skip it (skip()). Skipping keeps only the current read chunk
+    in memory, so peak usage is bounded by the largest value actually decoded
+    rather than by the size of the document.
+    """
+
+    CHUNK = 64 * 1024
+
+    def __init__(self, fp: Any, buf: bytes = b"") -> None:
+        self.fp = fp
+        self.buf = buf  # already read from fp (see project_state())
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        """Drop consumed bytes and append one chunk; False at end of stream."""
+        chunk = self.fp.read(self.CHUNK)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def at_end(self) -> bool:
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return False
+            if not self._fill():
+                return True
+
+    def peek(self) -> bytes:
+        """Next significant byte, not consumed."""
+        char = self.buf[self.pos:self.pos + 1]
+        if char and char not in b" \t\r\n":
+            return char
+        if self.at_end():
+            raise ValueError("unexpected end of JSON stream")
+        return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: bytes) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at stream offset {self.pos}")
+        self.pos += 1
+
+    def _string_end(self, start: int) -> int:
+        """Offset just past the string opening at `start` (relative to pos)."""
+        at = start + 1
+        while True:
+            end = self.buf.find(b'"', self.pos + at)
+            if end < 0:
+                at = len(self.buf) - self.pos
+                if not self._fill():
+                    raise ValueError("unterminated string in JSON stream")
+                continue
+            escapes = 0
+            while self.buf[end - 1 - escapes] == 0x5C:  # backslash
+                escapes += 1
+            if escapes % 2 == 0:
+                return end + 1 - self.pos
+            at = end + 1 - self.pos
+
+    def _value_end(self, keep: bool) -> int:
+        """Offset (relative to pos) just past the value at pos.
+
+        With keep=False the consumed bytes are released as the scan goes, so a
+        multi-megabyte value costs no more than one chunk to skip.
+        """
+        first_byte = self.peek()
+        if first_byte == b'"':
+            return self._string_end(0)
+        if first_byte not in b"{[":
+            while True:
+                match = _SCALAR.match(self.buf, self.pos)
+                if match and match.end() < len(self.buf):
+                    return match.end() - self.pos
+                if not self._fill():  # the scalar may straddle a chunk boundary
+                    if match:
+                        return match.end() - self.pos
+                    raise ValueError(f"unexpected {first_byte!r} in JSON stream")
+        depth, at = 0, 0
+        while True:
+            match = _STRUCTURE.search(self.buf, self.pos + at)
+            if match is None:
+                if not keep:
+                    self.pos = len(self.buf)
+                    at = 0
+                else:
+                    at = len(self.buf) - self.pos
+                if not self._fill():
+                    raise ValueError("unexpected end of JSON stream")
+                continue
+            at = match.start() - self.pos
+            char = match.group()
+            if char == b'"':
+                at = self._string_end(at)
+                continue
+            depth += 1 if char in b"{[" else -1
+            at += 1
+            if depth == 0:
+                return at
+            if not keep:
+                self.pos += at
+                at = 0
+
+    def value(self) -> Any:
+        end = self._value_end(keep=True)
+        raw = self.buf[self.pos:self.pos + end]
+        self.pos += end
+        return json.loads(raw)
+
+    def skip(self) -> None:
+        end = self._value_end(keep=False)  # may refill, which rebases pos
+        self.pos += end
+
+    def members(self) -> Any:
+        """Yield each key of the object at pos; consume its value before resuming."""
+        self.expect(b"{")
+        if self.peek() == b"}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != b'"':
+                raise ValueError(f"expected an object key at stream offset {self.pos}")
+            end = self._string_end(0)
+            raw = self.buf[self.pos + 1:self.pos + end - 1]
+            key = json.loads(b'"' + raw + b'"') if b"\\" in raw else raw.decode()
+            self.pos += end
+            self.expect(b":")
+            yield key
+            if self.peek() == b",":
+                self.pos += 1
+                continue
+            self.expect(b"}")
+            return
+
+    def items(self) -> Any:
+        """Yield once per element of the array at pos; consume it before resuming."""
+        self.expect(b"[")
+        if self.peek() == b"]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == b",":
+                self.pos += 1
+                continue
+            self.expect(b"]")
+            return
+
+
+def _project_instance(stream: JsonStream) -> dict[str, Any]:
+    inst: dict[str, Any] = {"attributes": {}}
+    for key in stream.members():
+        if key == "index_key":
+            inst["index_key"] = stream.value()
+            continue
+        if key != "attributes":
+            stream.skip()
+            continue
+        for attr in stream.members():
+            if attr in PROJECTED_ATTRS:
+                inst["attributes"][attr] = stream.value()
+            else:
+                stream.skip()
+    return inst
+
+
+def project_document(doc: dict[str, Any], known: tuple[Any, Any] | None = None) -> dict[str, Any] | None:
+    """project_state() for a state already decoded as a whole."""
+    state: dict[str, Any] = {"resources": []}
+    for key in ("serial", "lineage"):
+        if key in doc:
+            state[key] = doc[key]
+    if known is not None and (state.get("serial"), state.get("lineage")) == known:
+        return None
+    for resource in doc.get("resources") or []:
+        if resource.get("type") not in HOST_TYPES:
+            continue
+        res = {f: resource[f] for f in ("type", "mode", "module", "name") if f in resource}
+        if "instances" in resource:
+            res["instances"] = [
+                {
+                    **({"index_key": inst["index_key"]} if "index_key" in inst else {}),
+                    "attributes": {
+                        attr: value for attr, value in (inst.get("attributes") or {}).items()
+                        if attr in PROJECTED_ATTRS
+                    },
+                }
+                for inst in resource["instances"]
+            ]
+        state["resources"].append(res)
+    return state
+
+
+def project_state(fp: Any, known: tuple[Any, Any] | None = None,
+                  stream_above: int | None = None) -> dict[str, Any] | None:
+    """Decode a raw state into the slice hosts_from_state() reads.
+
+    Keeps `serial`, `lineage` and, for HOST_TYPES resources only, their
+    address parts (mode, module, name) and each instance's index_key and
+    PROJECTED_ATTRS. Returns None when the header equals `known`.
+
+    A state of up to `stream_above` bytes (INVENTORY_STREAM_MB, default 64
+    MiB; 0 always streams) is read whole and decoded by json.loads, which is
+    several times faster than JsonStream. Past that it is stream-decoded,
+    everything outside the slice skipped in-stream, so peak memory follows
+    the number of hosts rather than the size of the state.
+    """
+    if stream_above is None:
+        stream_above = _env_int("INVENTORY_STREAM_MB", 64) * 1024 * 1024
+    head = bytearray()
+    while len(head) <= stream_above:
+        chunk = fp.read(JsonStream.CHUNK if stream_above == 0 else 1024 * 1024)
+        if not chunk:
+            if not head.strip():
+                return {}
+            doc = json.loads(head)
+            if not isinstance(doc, dict):
+                raise ValueError("state is not a JSON object")
+            return project_document(doc, known)
+        head += chunk
+    stream = JsonStream(fp, bytes(head))
+    del head
+    state: dict[str, Any] = {"resources": []}
+    if stream.at_end():
         return {}
+    for key in stream.members():
+        if key in ("serial", "lineage"):
+            state[key] = stream.value()
+            if known is not None and (state.get("serial"), state.get("lineage")) == known:
+                return None
+        elif key == "resources":
+            for _ in stream.items():
+                res: dict[str, Any] = {}
+                for field in stream.members():
+                    if field in ("type", "mode", "module", "name"):
+                        res[field] = stream.value()
+                    elif field == "instances" and res.get("type", "") in HOST_TYPES | {""}:
+                        # Terraform writes `type` first; project regardless if not.
+                        res["instances"] = [_project_instance(stream) for _ in stream.items()]
+                    else:
+                        stream.skip()
+                if res.get("type") in HOST_TYPES:
+                    state["resources"].append(res)
+        else:
+            stream.skip()
+    return state
+
+
+class PullError(Exception):
+    """A project's state could not be pulled (exit status, timeout, bad JSON)."""
+
 
-    if cache_on:
+def _terragrunt_pull(project: dict[str, Any], cwd: Path,
+                     known: tuple[Any, Any] | None) -> dict[str, Any] | None:
+    """Run the pull, stopping after the header when it still matches `known`.
+
+    The pull runs in its own process group and the whole group is killed once
+    INVENTORY_PULL_TIMEOUT seconds (default 60) pass, so a hung terragrunt (or
+    the tofu it spawned) can never hold the inventory up for longer than that.
+    """
+    import signal
+    import subprocess
+    import tempfile
+    import threading
+
+    timeout = _env_int("INVENTORY_PULL_TIMEOUT", 60)
+    with span("pull") as traced, tempfile.TemporaryFile() as err:
+        launched = time.perf_counter()
         try:
-            cache_file.write_text(json.dumps(state))
-        except OSError:
-            pass  # caching is best-effort
+            proc = subprocess.Popen(
+                ["terragrunt", "state", "pull"],
+                cwd=cwd, stdout=subprocess.PIPE, stderr=err, start_new_session=True,
+            )
+        except OSError as exc:
+            raise PullError(str(exc)) from exc
+
+        def kill() -> None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass  # already gone
+
+        timed_out = threading.Event()
+
+        def expire() -> None:
+            timed_out.set()
+            kill()
+
+        timer = threading.Timer(timeout, expire) if timeout > 0 else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        with proc:
+            # Decoding is interleaved with the fetch; when tracing, time spent
+            # blocked on the pipe (terragrunt init + R2 download) is split out.
+            reader = _TimedReader(proc.stdout) if TRACE else proc.stdout
+            try:
+                with span("decode") as decoding:
+                    state = project_state(reader, known)
+                decode_error = None
+            except ValueError as exc:  # JSONDecodeError included
+                state, decode_error = {}, exc
+            if state is None:
+                kill()
+            else:
+                proc.stdout.read()  # drain, so a writer blocked on the pipe can exit
+            rc = proc.wait()
+        if timer:
+            timer.cancel()
+        traced.update(exit=rc, timed_out=timed_out.is_set(), unchanged=state is None)
+        if TRACE:
+            decoding.update(bytes=reader.bytes, read_wait_ms=round(reader.wait * 1000, 3))
+            if reader.first_byte is not None:
+                traced["first_byte_ms"] = round((reader.first_byte - launched) * 1000, 3)
+        if state is None:
+            return None
+        if timed_out.is_set():
+            raise PullError(f"timed out after {timeout}s")
+        if rc != 0:
+            err.seek(0)
+            detail = err.read().decode(errors="replace").strip().splitlines()
+            raise PullError(f"exit {rc}: {detail[-1] if detail else 'no output'}")
+    if decode_error is not None:
+        raise PullError(str(decode_error))
     return state
 
 
+# --- Direct backend reader (INVENTORY_BACKEND=direct) -----------------------
+# Reads the state object straight from the S3-compatible backend root.hcl
+# configures, skipping terragrunt + OpenTofu start-up and backend init. Only
+# the plain shape this repo uses is understood; anything else raises
+# BackendUnsupported and the pull goes through terragrunt as usual.
+
+class BackendUnsupported(Exception):
+    """The project's backend config is outside what the direct reader handles."""
+
+
+_HCL_STRING = r'\s*=\s*"([^"]*)"'
+_backend_configs: dict[Path, dict[str, str]] = {}
+
+
+def backend_config(cwd: Path) -> dict[str, str]:
+    """bucket/key/endpoint/region/profile for one unit, from its root.hcl.
+
+    Resolved once per unit directory. The unit's terragrunt.hcl must only
+    include root.hcl, whose remote_state must be a literal s3 config; the
+    key may use ${path_relative_to_include()}, nothing else interpolated.
+    INVENTORY_S3_ENDPOINT replaces the endpoint (e.g. a local stand-in).
+    """
+    if cwd in _backend_configs:
+        return _backend_configs[cwd]
+    unit = (cwd / "terragrunt.hcl").read_text()
+    if "remote_state" in unit or 'find_in_parent_folders("root.hcl")' not in unit:
+        raise BackendUnsupported("terragrunt.hcl does not simply include root.hcl")
+    root = next((d / "root.hcl" for d in cwd.parents if (d / "root.hcl").is_file()), None)
+    if root is None:
+        raise BackendUnsupported("no root.hcl above the unit")
+    block = re.search(r"^remote_state\s*\{(.*?)^\}", root.read_text(), re.S | re.M)
+    if block is None:
+        raise BackendUnsupported("no remote_state block in root.hcl")
+    body = block.group(1)
+
+    def attr(name: str) -> str:
+        match = re.search(rf"^\s*{name}{_HCL_STRING}", body, re.M)
+        value = match.group(1) if match else ""
+        value = value.replace("${path_relative_to_include()}", cwd.relative_to(root.parent).as_posix())
+        if "${" in value:
+            raise BackendUnsupported(f"{name} uses unsupported interpolation")
+        return value
+
+    if attr("backend") != "s3":
+        raise BackendUnsupported(f"backend {attr('backend')!r} is not s3")
+    config = {
+        "bucket": attr("bucket"), "key": attr("key"),
+        "region": attr("region") or "us-east-1", "profile": attr("profile"),
+        # endpoints = { s3 = "..." }, or the older top-level endpoint.
+        "endpoint": attr("s3") or attr("endpoint"),
+    }
+    if not config["bucket"] or not config["key"]:
+        raise BackendUnsupported("bucket/key not set")
+    config["endpoint"] = (os.environ.get("INVENTORY_S3_ENDPOINT") or config["endpoint"]
+                          or f"https://s3.{config['region']}.amazonaws.com")
+    _backend_configs[cwd] = config
+    return config
+
+
+def _credentials(profile: str) -> tuple[str, str, str]:
+    """(access key, secret, session token) — AWS_* env vars, else the profile."""
+    if os.environ.get("AWS_ACCESS_KEY_ID") and os.environ.get("AWS_SECRET_ACCESS_KEY"):
+        return (os.environ["AWS_ACCESS_KEY_ID"], os.environ["AWS_SECRET_ACCESS_KEY"],
+                os.environ.get("AWS_SESSION_TOKEN", ""))
+    import configparser
+
+    profile = os.environ.get("AWS_PROFILE") or profile or "default"
+    path = os.environ.get("AWS_SHARED_CREDENTIALS_FILE") or Path.home() / ".aws" / "credentials"
+    creds = configparser.ConfigParser()
+    creds.read(path)
+    if not creds.has_option(profile, "aws_secret_access_key"):
+        raise BackendUnsupported(f"no static credentials for profile {profile!r}")
+    section = creds[profile]
+    return (section.get("aws_access_key_id", ""), section["aws_secret_access_key"],
+            section.get("aws_session_token", ""))
+
+
+def sign_request(method: str, host: str, path: str, region: str,
+                 creds: tuple[str, str, str], amz_date: str,
+                 headers: dict[str, str] | None = None) -> dict[str, str]:
+    """Headers for an AWS Signature Version 4 signed, bodiless S3 request.
+
+    `path` is the already-encoded request path; every header in `headers`
+    is signed along with host, x-amz-date and x-amz-content-sha256.
+    """
+    import hashlib
+    import hmac
+
+    access_key, secret, token = creds
+    payload = hashlib.sha256(b"").hexdigest()
+    signed = {k.lower(): v.strip() for k, v in (headers or {}).items()}
+    signed.update({"host": host, "x-amz-content-sha256": payload, "x-amz-date": amz_date})
+    if token:
+        signed["x-amz-security-token"] = token
+    names = ";".join(sorted(signed))
+    canonical = "\n".join([
+        method, path, "",
+        *(f"{k}:{signed[k]}" for k in sorted(signed)), "",
+        names, payload,
+    ])
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+    to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest(),
+    ])
+    key = f"AWS4{secret}".encode()
+    for part in (amz_date[:8], region, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={names}, Signature={signature}"
+    )
+    del signed["host"]  # http.client sends it
+    return signed
+
+
+# Idle keep-alive connections per (scheme, host:port), shared by all pulls in
+# this process — across projects in one run, and across refreshes in --serve.
+_idle_connections: dict[tuple[str, str], list[Any]] = {}
+_idle_lock = _thread.allocate_lock()
+
+
+def _connection(scheme: str, netloc: str, fresh: bool = False) -> tuple[Any, bool]:
+    """(connection, whether it is a reused idle one)."""
+    if not fresh:
+        with _idle_lock:
+            idle = _idle_connections.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+    import http.client
+
+    factory = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    return factory(netloc, timeout=_env_int("INVENTORY_PULL_TIMEOUT", 60)), False
+
+
+def _release(scheme: str, netloc: str, conn: Any) -> None:
+    with _idle_lock:
+        _idle_connections.setdefault((scheme, netloc), []).append(conn)
+
+
+def _direct_pull(cwd: Path, known: tuple[Any, Any] | None,
+                 etag: str | None) -> dict[str, Any] | None:
+    """GET the state object; None when it is unchanged (304, or same header).
+
+    With `known` and the `etag` it was read at, the GET is conditional
+    (If-None-Match), so an unchanged state costs one empty 304. The ETag of a
+    fresh read is returned in the state as "etag".
+    """
+    import http.client
+    from datetime import datetime, timezone
+    from urllib.parse import quote, urlsplit
+
+    config = backend_config(cwd)
+    creds = _credentials(config["profile"])
+    endpoint = urlsplit(config["endpoint"])
+    if endpoint.scheme not in ("http", "https"):
+        raise BackendUnsupported(f"endpoint scheme {endpoint.scheme!r}")
+    # Path-style addressing: works for R2, MinIO and other stand-ins alike.
+    path = quote(f"{endpoint.path.rstrip('/')}/{config['bucket']}/{config['key']}", safe="/-_.~")
+    extra = {"If-None-Match": etag} if known is not None and etag else {}
+
+    with span("pull", backend="direct") as traced:
+        # A pooled connection may have been closed by the server meanwhile;
+        # retry once on a fresh one before giving up.
+        for fresh in (False, True):
+            conn, reused = _connection(endpoint.scheme, endpoint.netloc, fresh)
+            amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            headers = sign_request("GET", endpoint.netloc, path, config["region"], creds, amz_date)
+            try:
+                conn.request("GET", path, headers={**headers, **extra})
+                resp = conn.getresponse()
+                break
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                if fresh or not reused:
+                    raise PullError(f"GET {endpoint.netloc}{path}: {exc}") from exc
+        traced.update(status=resp.status, reused=reused)
+        if resp.status == 304:
+            resp.read()
+            _release(endpoint.scheme, endpoint.netloc, conn)
+            return None
+        if resp.status != 200:
+            detail = re.search(rb"<Code>([^<]*)</Code>", resp.read())
+            conn.close()
+            raise PullError(f"HTTP {resp.status}" + (f" {detail.group(1).decode()}" if detail else ""))
+        reader = _TimedReader(resp) if TRACE else resp
+        try:
+            with span("decode") as decoding:
+                state = project_state(reader, known)
+        except (ValueError, OSError, http.client.HTTPException) as exc:
+            conn.close()
+            raise PullError(str(exc)) from exc
+        if TRACE:
+            decoding.update(bytes=reader.bytes, read_wait_ms=round(reader.wait * 1000, 3))
+        if state is None:
+            conn.close()  # body left unread — the connection cannot be reused
+            return None
+        resp.read()
+        if resp.will_close:
+            conn.close()
+        else:
+            _release(endpoint.scheme, endpoint.netloc, conn)
+        if state:
+            state["etag"] = resp.getheader("ETag")
+        return state
+
+
+def pull_state(project: dict[str, Any], known: tuple[Any, Any] | None = None,
+               etag: str | None = None) -> dict[str, Any] | None:
+    """`terragrunt state pull` for one project; raises PullError on failure.
+
+    The pull is decoded as a stream (project_state()), so the returned dict is
+    the projected slice of the state, never the whole document. A project
+    directory that does not exist yields an empty dict.
+
+    `known` is the (serial, lineage) the caller already holds hosts for. When
+    the live state still carries that exact header the pull is cut short right
+    after it and None is returned — "unchanged, keep yours".
+
+    With INVENTORY_BACKEND=direct the state object is read from the backend
+    itself (_direct_pull(), conditional on `etag`); unsupported configs and
+    failed reads fall back to terragrunt.
+    """
+    cwd = (SCRIPT_DIR / project["path"]).resolve()
+    if not cwd.exists():
+        return {}
+    if os.environ.get("INVENTORY_BACKEND") == "direct":
+        try:
+            return _direct_pull(cwd, known, etag)
+        except (BackendUnsupported, OSError) as exc:
+            trace_event("direct read unsupported", reason=str(exc))
+        except PullError as exc:
+            sys.stderr.write(
+                f"warn: direct state read failed for {project['path']}: {exc}; "
+                "falling back to terragrunt\n"
+            )
+    return _terragrunt_pull(project, cwd, known)
+
+
 def first(seq: Any) -> Any:
     """Return seq[0] for the bpg single-nested-block lists, else seq."""
     return seq[0] if isinstance(seq, list) and seq else seq
@@ -145,43 +1037,552 @@ def host_from_instance(attrs: dict[str, Any], project: dict[str, Any]) -> tuple[
     return hostname, hv
 
 
+def host_facts(attrs: dict[str, Any]) -> dict[str, Any]:
+    """State attributes kept alongside a host for lookups, never emitted."""
+    nics = (attrs.get("network_interface") or []) + (attrs.get("network_device") or [])
+    return {
+        "vmid": attrs.get("vm_id"),
+        "node": attrs.get("node_name"),
+        "vlans": sorted({nic["vlan_id"] for nic in nics if isinstance(nic, dict) and nic.get("vlan_id")}),
+        "cores": (first(attrs.get("cpu")) or {}).get("cores"),
+        "memory_mb": (first(attrs.get("memory")) or {}).get("dedicated"),
+    }
+
+
+def host_groups(host: str, hv: dict[str, Any], project: dict[str, Any],
+                facts: dict[str, Any] | None = None) -> list[str]:
+    """The project group, one group per Proxmox tag, its node and VLAN groups."""
+    groups = [project["group"]]
+    for tag in hv.get("proxmox_tags", []):
+        # Skip a tag equal to the hostname (avoids a host/group name clash).
+        if str(tag) == host:
+            continue
+        groups.append(safe_group(str(tag)))
+    facts = facts or {}
+    if facts.get("node"):
+        groups.append(safe_group(f"{NODE_GROUP_PREFIX}{facts['node']}"))
+    groups.extend(f"{VLAN_GROUP_PREFIX}{vlan}" for vlan in facts.get("vlans", []))
+    return groups
+
+
+def composite_members(pattern: str, groups: dict[str, set[str]], hosts: Any) -> set[str]:
+    """Evaluate one COMPOSITE_GROUPS pattern against the group → hosts index.
+
+    As in Ansible, a term naming a host rather than a group means that host.
+    """
+    members: set[str] = set()
+    for term in pattern.split(":"):
+        name = term.lstrip("&!")
+        matched = groups.get(name) or ({name} if name in hosts else set())
+        if term.startswith("&"):
+            members &= matched
+        elif term.startswith("!"):
+            members -= matched
+        else:
+            members |= matched
+    return members
+
+
+def hosts_from_state(state: dict[str, Any], project: dict[str, Any]) -> list[HostRecord]:
+    """Every host record one project's state yields, in state order."""
+    hosts: list[HostRecord] = []
+    for res in state.get("resources", []):
+        if res.get("type") not in HOST_TYPES:
+            continue
+        for inst in res.get("instances", []):
+            attrs = inst.get("attributes", {})
+            parsed = host_from_instance(attrs, project)
+            if parsed:
+                host, hv = parsed
+                facts = host_facts(attrs)
+                hosts.append((host, hv, facts, host_groups(host, hv, project, facts)))
+    return hosts
+
+
+def managed_from_state(state: dict[str, Any]) -> list[ManagedRecord]:
+    """Every managed HOST_TYPES instance with a VMID, as a ManagedRecord.
+
+    Addresses are what `terraform import` / `state list` print, e.g.
+    module.lxc[0].proxmox_virtual_environment_container.container["adguard-1"].
+    """
+    managed: list[ManagedRecord] = []
+    for res in state.get("resources", []):
+        if res.get("type") not in HOST_TYPES or res.get("mode", "managed") != "managed":
+            continue
+        base = ".".join(filter(None, (res.get("module"), res["type"], res.get("name"))))
+        for inst in res.get("instances", []):
+            attrs = inst.get("attributes", {})
+            if attrs.get("vm_id") is None:
+                continue
+            key = inst.get("index_key")
+            address = base if key is None else f"{base}[{json.dumps(key)}]"
+            managed.append((int(attrs["vm_id"]), attrs.get("node_name"), address))
+    return managed
+
+
+def discover_projects() -> list[dict[str, Any]]:
+    """Every Terragrunt project under TF_ROOT (INVENTORY_TF_ROOT overrides).
+
+    `path` stays relative to this script, as cache keys are derived from it.
+    """
+    root = Path(os.environ.get("INVENTORY_TF_ROOT") or TF_ROOT)
+    projects = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames if not d.startswith((".", "_")) and d not in SKIP_DIRS
+        )
+        if "terragrunt.hcl" not in filenames:
+            continue
+        name = Path(dirpath).relative_to(root).as_posix()
+        if name == ".":
+            name = root.resolve().name
+        settings = PROJECT_SETTINGS.get(name) or {"group": safe_group(name.replace("/", "_"))}
+        projects.append({"path": os.path.relpath(dirpath, SCRIPT_DIR), **settings})
+    return projects
+
+
+def _read_entry(project: dict[str, Any]) -> tuple[dict[str, Any] | None, float]:
+    """(cache entry, age in seconds) for a project; (None, inf) when unusable."""
+    path = _cache_path(project)
+    try:
+        st = path.stat()
+        # Never unmarshal a file someone else planted under our name in /tmp.
+        if st.st_uid != os.getuid():
+            return None, float("inf")
+        entry = marshal.loads(path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None, float("inf")
+    if not isinstance(entry, dict) or entry.get("tag") != CACHE_TAG:
+        return None, float("inf")
+    return entry, time.time() - st.st_mtime
+
+
+def _refresh_entry(project: dict[str, Any], entry: dict[str, Any] | None) -> dict[str, Any]:
+    """Pull one project and update its cache entry; reuse `entry` if unchanged.
+
+    When the pull fails, `entry` is the last-known-good host set: it is
+    served again (marked `stale`, its hosts in STALE_GROUP) rather than
+    vanishing. With no entry to fall back on the result is empty and marked
+    `failed`.
+    """
+    path = _cache_path(project)
+    counted = os.environ.get("INVENTORY_CACHE") == "1"
+    incremental = os.environ.get("INVENTORY_INCREMENTAL", "1") != "0"
+    known = (entry["serial"], entry["lineage"]) if entry and incremental else None
+    try:
+        state = pull_state(project, known, entry.get("etag") if known else None)
+    except PullError as exc:
+        trace_event("pull failed", error=str(exc), fallback=entry is not None)
+        if entry is None:
+            sys.stderr.write(f"warn: state pull failed for {project['path']}: {exc}\n")
+            return {"hosts": [], "managed": [], "failed": True}
+        sys.stderr.write(
+            f"warn: state pull failed for {project['path']}: {exc}; serving its "
+            f"last-known-good hosts (serial {entry['serial']}) in group {STALE_GROUP}\n"
+        )
+        hosts = [(h, hv, facts, [*groups, STALE_GROUP]) for h, hv, facts, groups in entry["hosts"]]
+        return {**entry, "hosts": hosts, "stale": True}
+    if state is None and entry:
+        trace_event("state unchanged", serial=entry["serial"])
+        try:
+            os.utime(path)  # same state, so the entry is fresh again
+            if counted:
+                _count("refresh")
+        except OSError:
+            pass
+        return entry
+
+    with span("project") as traced:
+        hosts = hosts_from_state(state or {}, project)
+        managed = managed_from_state(state or {})
+        traced.update(hosts=len(hosts), managed=len(managed))
+    header = ((state or {}).get("serial"), (state or {}).get("lineage"))
+    fresh = {
+        "tag": CACHE_TAG, "serial": header[0], "lineage": header[1],
+        "etag": (state or {}).get("etag"), "hosts": hosts, "managed": managed,
+    }
+    if state and None not in header:
+        try:
+            _atomic_write(path, marshal.dumps(fresh))
+            if counted:
+                _count("refresh")
+        except (OSError, ValueError):
+            pass  # the cache is best-effort
+    return fresh
+
+
+def _cached_entry(project: dict[str, Any]) -> dict[str, Any] | None:
+    """A fresh (or servable stale) cache entry, else None.
+
+    Only with INVENTORY_CACHE=1; a stale hit also kicks off one background
+    refresh. This is the whole cache-hit path — no pull, no lock, no pool.
+    """
+    if os.environ.get("INVENTORY_CACHE") != "1":
+        return None
+    entry, age = _read_entry(project)
+    if entry is None:
+        return None
+    ttl = _env_int("INVENTORY_CACHE_TTL", 60)
+    if age < ttl:
+        _count("hit")
+        return entry
+    if age < ttl + _env_int("INVENTORY_CACHE_STALE", 300):
+        _count("stale")
+        _spawn_refresh(project)
+        return entry
+    return None
+
+
+def _cached_hosts(project: dict[str, Any]) -> list[HostRecord] | None:
+    """Hosts straight from _cached_entry(), else None."""
+    entry = _cached_entry(project)
+    return None if entry is None else list(entry["hosts"])
+
+
+def project_hosts(project: dict[str, Any]) -> list[HostRecord]:
+    """Host records for one project (see project_entry())."""
+    return list(project_entry(project)["hosts"])
+
+
+def project_entry(project: dict[str, Any]) -> dict[str, Any]:
+    """One project's cache entry, re-derived only when its state moved.
+
+    Terraform bumps `serial` on every state write and mints a new `lineage`
+    when a state is re-created, so an unchanged (serial, lineage) pair means
+    the cached host records are exactly what a full re-parse would give.
+    With INVENTORY_CACHE=1 a fresh entry skips the pull entirely, and misses
+    are single-flight: the first process to miss pulls, the rest queue on the
+    lock and then find the entry it just wrote. The cache is purely a latency
+    optimization — it never changes WHAT is emitted, only how often R2 is hit.
+    """
+    cached = _cached_entry(project)
+    if cached is not None:
+        return cached
+    if os.environ.get("INVENTORY_CACHE") != "1":
+        return _refresh_entry(project, _read_entry(project)[0])
+
+    with _flock(_cache_path(project, "lock")):
+        entry, age = _read_entry(project)
+        if entry is not None and age < _env_int("INVENTORY_CACHE_TTL", 60):
+            _count("coalesced")
+            return entry
+        _count("miss")
+        return _refresh_entry(project, entry)
+
+
+def _spawn_refresh(project: dict[str, Any]) -> None:
+    """Refresh one project's entry in a detached process, unless one already is."""
+    import subprocess
+
+    with _flock(_cache_path(project, "lock"), blocking=False) as free:
+        if not free:
+            return
+    try:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--refresh-cache", project["path"]],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass  # the stale entry was still served; the next miss refreshes
+
+
+def refresh_cache(path: str) -> int:
+    """Body of the detached --refresh-cache process for one project path."""
+    project = next((p for p in discover_projects() if p["path"] == path), None)
+    if project is None:
+        return 1
+    with _flock(_cache_path(project, "lock"), blocking=False) as free:
+        if not free:
+            return 0  # another refresher beat us to it
+        entry, age = _read_entry(project)
+        if entry is not None and age < _env_int("INVENTORY_CACHE_TTL", 60):
+            return 0
+        _refresh_entry(project, entry)
+    return 0
+
+
+def _snapshot_path(kind: str) -> Path | None:
+    """File for this checkout's last built inventory ("snapshot") or its "index".
+
+    Kept in _private_dir(), not /tmp: --host trusts it as hostvars. None
+    when there is no private directory.
+    """
+    private = _private_dir()
+    if private is None:
+        return None
+    key = f"{zlib.crc32(str(SCRIPT_DIR).encode()):08x}"
+    return private / f"inventory-{key}.{kind}.json"
+
+
+def _save_snapshot(inv: dict[str, Any], index: dict[str, Any]) -> None:
+    snapshot, index_path = _snapshot_path("snapshot"), _snapshot_path("index")
+    if snapshot is None or index_path is None:
+        return
+    try:
+        # _atomic_write: an O_EXCL 0600 tempfile renamed into place.
+        _atomic_write(snapshot, json.dumps(inv).encode())
+        _atomic_write(index_path, json.dumps(index).encode())
+    except OSError:
+        pass  # lookups just fall back to a build
+
+
+def _load_snapshot(kind: str) -> dict[str, Any] | None:
+    """A snapshot file younger than INVENTORY_SNAPSHOT_TTL, else None.
+
+    Like cache entries, only a regular file this user owns and nobody else
+    can write is read.
+    """
+    ttl = _env_int("INVENTORY_SNAPSHOT_TTL", 60)
+    path = _snapshot_path(kind)
+    if path is None:
+        return None
+    try:
+        st = path.lstat()
+        if not stat.S_ISREG(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o022:
+            return None
+        if time.time() - st.st_mtime >= ttl:
+            return None
+        return json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
 def build() -> dict[str, Any]:
+    return build_indexed()[0]
+
+
+def build_indexed() -> tuple[dict[str, Any], dict[str, Any]]:
+    """Build the inventory plus its lookup index, and persist both as a snapshot.
+
+    The index maps hostname → hostvars, ansible_host → hostname and VMID →
+    hostname, so single-host queries never need the full inventory.
+    """
+    with span("build"):
+        return _build_indexed()
+
+
+def _stack_hosts(project: dict[str, Any], parent: int | None) -> list[HostRecord]:
+    """project_hosts() under its own trace span (it runs on a pool thread)."""
+    with span("stack", parent=parent, path=project["path"]):
+        return project_hosts(project)
+
+
+def _build_indexed() -> tuple[dict[str, Any], dict[str, Any]]:
     inv: dict[str, Any] = {"_meta": {"hostvars": {}}}
+    index: dict[str, dict[str, Any]] = {"host": {}, "ip": {}, "vmid": {}}
     groups: dict[str, set[str]] = {}
 
-    def add_group(name: str, host: str) -> None:
-        groups.setdefault(name, set()).add(host)
-
     # Pre-declare each project's group so it always resolves, even with zero
     # hosts (e.g. talos_cluster has no SSH hosts in this dynamic inventory; the
     # Talos nodes come from the static inventory/talos/hosts.yml). Empty groups
     # simply list no hosts.
-    for project in PROJECTS:
+    projects = discover_projects()
+    for project in projects:
         groups.setdefault(project["group"], set())
 
-    with ThreadPoolExecutor(max_workers=len(PROJECTS)) as pool:
-        states = list(pool.map(pull_state, PROJECTS))
+    # Cache hits are served inline; only projects that must pull get a thread,
+    # at most INVENTORY_WORKERS (default 8) at once. Every pull is bounded by
+    # INVENTORY_PULL_TIMEOUT, so one hung project cannot stall the rest.
+    per_project: list[list[HostRecord] | None] = []
+    for project in projects:
+        with span("cache", path=project["path"]) as traced:
+            per_project.append(_cached_hosts(project))
+            traced["hit"] = per_project[-1] is not None
+    pending = [i for i, hosts in enumerate(per_project) if hosts is None]
+    if pending:
+        from concurrent.futures import ThreadPoolExecutor
 
-    for project, state in zip(PROJECTS, states):
-        for res in state.get("resources", []):
-            if res.get("type") not in HOST_TYPES:
-                continue
-            for inst in res.get("instances", []):
-                parsed = host_from_instance(inst.get("attributes", {}), project)
-                if not parsed:
-                    continue
-                host, hv = parsed
+        workers = max(1, min(len(pending), _env_int("INVENTORY_WORKERS", 8)))
+        parent = current_span()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pulled = pool.map(_stack_hosts, [projects[i] for i in pending], [parent] * len(pending))
+            for i, hosts in zip(pending, pulled):
+                per_project[i] = hosts
+
+    with span("group") as traced:
+        for hosts in per_project:
+            for host, hv, facts, host_group_names in hosts or []:
                 inv["_meta"]["hostvars"][host] = hv
-                add_group(project["group"], host)
-                for tag in hv.get("proxmox_tags", []):
-                    # Skip a tag equal to the hostname (avoids a host/group name clash).
-                    if str(tag) == host:
-                        continue
-                    add_group(safe_group(str(tag)), host)
+                index["host"][host] = hv
+                if hv.get("ansible_host"):
+                    index["ip"][hv["ansible_host"]] = host
+                if facts.get("vmid") is not None:
+                    index["vmid"][str(facts["vmid"])] = host
+                for name in host_group_names:
+                    groups.setdefault(name, set()).add(host)
+
+        # `groups` is the inverted index (group → hosts); composites are set
+        # algebra over it, done once here rather than in every host pattern.
+        for name, pattern in COMPOSITE_GROUPS.items():
+            groups[name] = composite_members(pattern, groups, inv["_meta"]["hostvars"])
+        for name, members in groups.items():
+            inv[name] = {"hosts": sorted(members)}
+        traced.update(hosts=len(inv["_meta"]["hostvars"]), groups=len(groups))
+    with span("snapshot"):
+        _save_snapshot(inv, index)
+    fact_dir = _fact_cache_dir()
+    if fact_dir is not None:
+        with span("facts") as traced:
+            traced.update(zip(("written", "kept"), warm_fact_cache(fact_dir, per_project)))
+    return inv, index
+
+
+# --- Fact cache pre-warming (INVENTORY_FACT_CACHE / --warm-facts) ----------
+# What state already knows about a host, as entries in Ansible's jsonfile fact
+# cache. Real setup facts use the same names, so a play with
+# `gather_facts: false` can read ansible_facts.hostname / processor_vcpus /
+# memtotal_mb straight away. `module_setup` is deliberately NOT set: with
+# `gathering = smart` a full play still runs setup once and its real facts
+# replace these — entries written by setup are never overwritten.
+FACT_SOURCE = "terraform_state"
+
+
+def _fact_cache_dir() -> Path | None:
+    """Where to pre-warm facts: INVENTORY_FACT_CACHE, or None when off.
+
+    "1" means Ansible's own fact cache directory: ANSIBLE_CACHE_PLUGIN_CONNECTION,
+    else fact_caching_connection from the ansible.cfg above this script
+    (relative to that file, as the Makefile runs Ansible from there).
+    """
+    setting = os.environ.get("INVENTORY_FACT_CACHE", "")
+    if setting in ("", "0"):
+        return None
+    if setting != "1":
+        return Path(setting).expanduser()
+    if os.environ.get("ANSIBLE_CACHE_PLUGIN_CONNECTION"):
+        return Path(os.environ["ANSIBLE_CACHE_PLUGIN_CONNECTION"]).expanduser()
+    import configparser
+
+    cfg = configparser.ConfigParser(interpolation=None)
+    cfg.read(SCRIPT_DIR.parent / "ansible.cfg")
+    connection = cfg.get("defaults", "fact_caching_connection", fallback="")
+    return (SCRIPT_DIR.parent / Path(connection).expanduser()) if connection else None
+
+
+def host_fact_entry(host: str, hv: dict[str, Any], facts: dict[str, Any]) -> dict[str, Any]:
+    """A jsonfile fact-cache entry for one host, from state only."""
+    entry = {
+        "ansible_hostname": host.split(".")[0],
+        "ansible_nodename": host,
+        "proxmox_facts_source": FACT_SOURCE,
+        "proxmox_tags": hv.get("proxmox_tags", []),
+        "proxmox_vmid": facts.get("vmid"),
+        "proxmox_node": facts.get("node"),
+        "proxmox_vlans": facts.get("vlans", []),
+    }
+    if hv.get("ansible_host"):
+        entry["proxmox_ipv4"] = hv["ansible_host"]
+    if facts.get("cores"):
+        entry["ansible_processor_vcpus"] = facts["cores"]
+    if facts.get("memory_mb"):
+        entry["ansible_memtotal_mb"] = facts["memory_mb"]
+    return entry
 
-    for name, members in groups.items():
-        inv[name] = {"hosts": sorted(members)}
-    return inv
+
+def warm_fact_cache(directory: Path,
+                    per_project: list[list[HostRecord] | None]) -> tuple[int, int]:
+    """Write/refresh state-derived fact entries; (written, kept as gathered).
+
+    Existing entries from a real setup run (module_setup) are left alone; ours
+    are only rewritten when their content changed, so the jsonfile cache's
+    mtime-based timeout keeps meaning "last time state said so".
+    """
+    prefix = os.environ.get("ANSIBLE_CACHE_PLUGIN_PREFIX", "")
+    written = kept = 0
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError as exc:
+        sys.stderr.write(f"warn: cannot create fact cache {directory}: {exc}\n")
+        return 0, 0
+    for hosts in per_project:
+        for host, hv, facts, _ in hosts or []:
+            path = directory / f"{prefix}{host}"
+            entry = host_fact_entry(host, hv, facts)
+            try:
+                current = json.loads(path.read_text())
+            except (OSError, ValueError):
+                current = None
+            if isinstance(current, dict) and current.get("module_setup"):
+                kept += 1
+                continue
+            if current == entry:
+                try:
+                    os.utime(path)
+                except OSError as exc:
+                    sys.stderr.write(f"warn: cannot refresh fact cache entry {path}: {exc}\n")
+                continue
+            try:
+                _atomic_write(path, json.dumps(entry, indent=4, sort_keys=True).encode())
+                written += 1
+            except OSError as exc:
+                sys.stderr.write(f"warn: cannot write fact cache entry {path}: {exc}\n")
+    return written, kept
+
+
+def warm_facts() -> int:
+    """Body of --warm-facts: build once with fact pre-warming forced on."""
+    if os.environ.get("INVENTORY_FACT_CACHE", "0") == "0":
+        os.environ["INVENTORY_FACT_CACHE"] = "1"
+    directory = _fact_cache_dir()
+    if directory is None:
+        sys.stderr.write("error: no fact cache directory (set INVENTORY_FACT_CACHE=DIR)\n")
+        return 1
+    inv, _ = build_indexed()
+    sys.stderr.write(f"facts: {len(inv['_meta']['hostvars'])} hosts pre-warmed in {directory}\n")
+    return 0
+
+
+# What --doctor connects to: sshd, or apid on Talos nodes (talosctl's endpoint).
+SSH_PORT = 22
+TALOS_API_PORT = 50000
+
+
+def probe(address: str, port: int, timeout: float) -> tuple[float | None, str]:
+    """(connect latency in seconds, "") for one TCP port, or (None, reason)."""
+    import socket
+
+    started = time.perf_counter()
+    try:
+        with socket.create_connection((address, port), timeout=timeout):
+            return time.perf_counter() - started, ""
+    except socket.timeout:
+        return None, f"no answer within {timeout:g}s"
+    except OSError as exc:
+        return None, exc.strerror or str(exc)
+
+
+def probe_hosts(inv: dict[str, Any]) -> dict[str, tuple[str, int, float | None, str]]:
+    """Probe every host with an ansible_host concurrently.
+
+    host → (address, port, latency or None, failure reason). SSH hosts are
+    probed on their ansible_port (default 22), hosts of a Talos project on the
+    Talos API port. At most INVENTORY_PROBE_WORKERS (default 64) connects are
+    in flight, each bounded by INVENTORY_PROBE_TIMEOUT seconds (default 2), so
+    the whole sweep takes about one timeout per batch of workers.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    talos_groups = {s["group"] for s in PROJECT_SETTINGS.values() if s.get("talos")}
+    talos_hosts = {h for g in talos_groups for h in inv.get(g, {}).get("hosts", [])}
+    targets = {}
+    for host, hv in inv["_meta"]["hostvars"].items():
+        if hv.get("ansible_host"):
+            port = TALOS_API_PORT if host in talos_hosts else int(hv.get("ansible_port", SSH_PORT))
+            targets[host] = (hv["ansible_host"], port)
+    if not targets:
+        return {}
+    try:
+        timeout = float(os.environ.get("INVENTORY_PROBE_TIMEOUT", 2))
+    except ValueError:
+        timeout = 2.0
+    workers = max(1, min(len(targets), _env_int("INVENTORY_PROBE_WORKERS", 64)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda t: probe(*t, timeout), targets.values())
+        return {
+            host: (address, port, latency, reason)
+            for (host, (address, port)), (latency, reason) in zip(targets.items(), results)
+        }
 
 
 def doctor() -> int:
@@ -194,7 +1595,7 @@ def doctor() -> int:
     if which("terragrunt") is None:
         problems.append("terragrunt not found on PATH (state pull will fail)")
 
-    inv = build()
+    inv = resolve("list")
     hostvars = inv["_meta"]["hostvars"]
     groups = {k for k in inv if k != "_meta"}
 
@@ -219,6 +1620,59 @@ def doctor() -> int:
     for name in sorted(collisions):
         problems.append(f"name collision: '{name}' is both a host and a group")
 
+    # ... and generated groups (composites, node_*/vlan_*, changed/stale) must
+    # not silently merge with, or replace, a tag or project group.
+    tag_groups = {safe_group(str(t)) for hv in hostvars.values() for t in hv.get("proxmox_tags", [])}
+    source_groups = tag_groups | {p["group"] for p in discover_projects()}
+    derived = {g for g in groups if g.startswith((NODE_GROUP_PREFIX, VLAN_GROUP_PREFIX))}
+    for name in sorted((derived | {CHANGED_GROUP, STALE_GROUP}) & source_groups):
+        problems.append(f"name collision: generated group '{name}' is also a tag/project group")
+    for name, pattern in sorted(COMPOSITE_GROUPS.items()):
+        if name in source_groups or name in derived:
+            problems.append(f"name collision: composite group '{name}' replaces an existing group")
+        unknown = sorted({t.lstrip("&!") for t in pattern.split(":")} - groups - set(hostvars))
+        if unknown:
+            notes.append(f"composite group '{name}' ({pattern}) references groups with no "
+                         f"hosts: {', '.join(unknown)}")
+
+    # 3. hosts served from a last-known-good entry because their pull failed.
+    stale = inv.get(STALE_GROUP, {}).get("hosts", [])
+    if stale:
+        problems.append(
+            f"{len(stale)} host(s) from a failed pull served from last-known-good "
+            f"state: {', '.join(stale)}"
+        )
+
+    # 4. every host must still answer where state says it lives, before a
+    #    playbook spends ConnectionAttempts x timeout finding out.
+    if "--no-probe" not in sys.argv and os.environ.get("INVENTORY_PROBE") != "0":
+        started = time.perf_counter()
+        probes = probe_hosts(inv)
+        for host, (address, port, latency, reason) in sorted(probes.items()):
+            if latency is None:
+                problems.append(f"{host}: {address}:{port} unreachable ({reason})")
+            else:
+                notes.append(f"probe {host}: {address}:{port} {latency * 1000:.1f}ms")
+        if probes:
+            notes.append(f"probed {len(probes)} hosts in {time.perf_counter() - started:.1f}s")
+
+    if os.environ.get("INVENTORY_BACKEND") == "direct":
+        for project in discover_projects():
+            try:
+                config = backend_config((SCRIPT_DIR / project["path"]).resolve())
+                _credentials(config["profile"])
+                notes.append(f"{project['path']}: direct read of {config['endpoint']}/"
+                             f"{config['bucket']}/{config['key']}")
+            except (BackendUnsupported, OSError) as exc:
+                notes.append(f"{project['path']}: direct read unsupported, uses terragrunt ({exc})")
+
+    if os.environ.get("INVENTORY_CACHE") == "1":
+        try:
+            stats = json.loads(_stats_path().read_text())
+            notes.append("cache counters: " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
+        except (OSError, json.JSONDecodeError):
+            pass
+
     empty = sorted(g for g in groups if not inv[g].get("hosts"))
     if empty:
         notes.append(f"empty groups (expected for unused projects): {', '.join(empty)}")
@@ -235,14 +1689,345 @@ def doctor() -> int:
     return 0
 
 
+# The change feed: CHANGED_GROUP holds hosts that are new, or whose
+# CHANGE_KEYS differ, relative to the baseline inventory --save-baseline wrote
+# (after a converge); hosts gone since are its `inventory_removed_hosts` var.
+CHANGED_GROUP = "changed"
+CHANGE_KEYS = ("ansible_host", "proxmox_tags", "ansible_ssh_private_key_file")
+
+
+def _baseline_path() -> Path:
+    """INVENTORY_BASELINE, else a per-checkout file under $XDG_STATE_HOME."""
+    if os.environ.get("INVENTORY_BASELINE"):
+        return Path(os.environ["INVENTORY_BASELINE"])
+    state = Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state")
+    return state / "ansible-tfstate" / f"baseline-{zlib.crc32(str(SCRIPT_DIR).encode()):08x}.json"
+
+
+def _load_hostvars(path: Path) -> dict[str, Any] | None:
+    """hostvars of a saved inventory (--save-baseline or --list output)."""
+    try:
+        hostvars = json.loads(path.read_text())["_meta"]["hostvars"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return hostvars if isinstance(hostvars, dict) else None
+
+
+def changes_since(inv: dict[str, Any], before: dict[str, Any] | None) -> dict[str, list[str]]:
+    """{"changed": new + modified hosts, "new": ..., "removed": ...} vs `before`.
+
+    With no baseline at all every host counts as new — the safe answer for
+    `--limit changed`.
+    """
+    now = inv["_meta"]["hostvars"]
+    before = before or {}
+    new = sorted(h for h in now if h not in before)
+    modified = sorted(
+        h for h in now
+        if h in before and any(now[h].get(k) != before[h].get(k) for k in CHANGE_KEYS)
+    )
+    return {
+        "changed": sorted(new + modified),
+        "new": new,
+        "removed": sorted(h for h in before if h not in now),
+    }
+
+
+def with_changes(inv: dict[str, Any]) -> dict[str, Any]:
+    """`inv` plus CHANGED_GROUP, computed against the saved baseline."""
+    delta = changes_since(inv, _load_hostvars(_baseline_path()))
+    return {
+        **inv,
+        CHANGED_GROUP: {
+            "hosts": delta["changed"],
+            "vars": {"inventory_removed_hosts": delta["removed"]},
+        },
+    }
+
+
+def save_baseline(path: Path) -> int:
+    """Body of --save-baseline: record the current inventory as converged."""
+    inv = resolve("list")
+    inv.pop(CHANGED_GROUP, None)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, json.dumps(inv, sort_keys=True).encode())
+    except OSError as exc:
+        sys.stderr.write(f"error: cannot write baseline {path}: {exc}\n")
+        return 1
+    sys.stderr.write(f"baseline: {len(inv['_meta']['hostvars'])} hosts saved to {path}\n")
+    return 0
+
+
+def changed_since(path: Path) -> int:
+    """Body of --changed-since: print the change feed against a saved inventory."""
+    before = _load_hostvars(path)
+    if before is None:
+        sys.stderr.write(f"error: {path} is not a saved inventory\n")
+        return 2
+    emit(changes_since(resolve("list"), before), indent=2)
+    return 0
+
+
+# Queries answerable from the index alone, without the full inventory.
+INDEX_VERBS = {"host", "ip", "vmid"}
+
+
+def answer(inv: dict[str, Any] | None, index: dict[str, Any], request: str) -> Any:
+    """Resolve one query against an inventory + its index.
+
+    Queries: "list", "group NAME", "host NAME", "ip ADDR", "vmid ID". The
+    index-only verbs (INDEX_VERBS) may be asked with inv=None.
+    """
+    verb, _, arg = request.strip().partition(" ")
+    if verb == "host":
+        return index["host"].get(arg, {})
+    if verb in ("ip", "vmid"):
+        host = index[verb].get(arg)
+        return {host: index["host"][host]} if host else {}
+    if inv is None:
+        raise ValueError(f"query needs the full inventory: {request!r}")
+    if verb == "list":
+        return with_changes(inv)
+    if verb == "group":
+        if arg == CHANGED_GROUP:
+            return with_changes(inv)[CHANGED_GROUP]
+        return inv.get(arg, {}) if arg != "_meta" else {}
+    raise ValueError(f"unknown inventory query: {request!r}")
+
+
+def _socket_path() -> Path | None:
+    """INVENTORY_SOCKET, else inventory.sock in _private_dir() (None without one)."""
+    if os.environ.get("INVENTORY_SOCKET"):
+        return Path(os.environ["INVENTORY_SOCKET"])
+    private = _private_dir()
+    return private / "inventory.sock" if private else None
+
+
+def _own_socket(path: Path) -> bool:
+    """Whether `path` is a socket this user created (never follows a symlink)."""
+    try:
+        st = path.lstat()
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid()
+
+
+def _daemon_query(request: str) -> Any:
+    """Ask a running daemon; None when there is none (or it misbehaves).
+
+    Only a socket owned by this user is asked: anyone else's listener could
+    answer with a forged inventory.
+    """
+    if os.environ.get("INVENTORY_DAEMON") == "0":
+        return None
+    path = _socket_path()
+    if path is None or not _own_socket(path):
+        return None
+    import socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(str(path))
+            sock.sendall(request.encode() + b"\n")
+            with sock.makefile("rb") as reply:
+                data = reply.read()
+        return json.loads(data)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve(request: str) -> Any:
+    """Answer a query from the cheapest fresh source.
+
+    Order: the daemon, then (for anything but "list") a fresh snapshot, then a
+    full build() — which also refreshes the snapshot for the next caller.
+    """
+    with span("resolve", request=request) as traced:
+        result = _daemon_query(request)
+        if result is not None:
+            traced["source"] = "daemon"
+            return result
+        verb = request.partition(" ")[0]
+        index = _load_snapshot("index") if verb != "list" else None
+        inv = _load_snapshot("snapshot") if verb == "group" else None
+        if index is not None and (verb in INDEX_VERBS or inv is not None):
+            try:
+                traced["source"] = "snapshot"
+                return answer(inv, index, request)
+            except (KeyError, TypeError):
+                pass  # torn or foreign snapshot — rebuild below
+        traced["source"] = "build"
+        return answer(*build_indexed(), request)
+
+
+def serve() -> int:
+    """Run the resident daemon until interrupted."""
+    import signal
+    import socket
+    import socketserver
+    import threading
+
+    class InventoryDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path: Path) -> None:
+            self.inv, self.index = build_indexed()
+            self.lock = threading.Lock()
+            super().__init__(str(path), QueryHandler)
+
+        def refresh_forever(self, interval: float) -> None:
+            while True:
+                time.sleep(interval)
+                started = time.monotonic()
+                inv, index = build_indexed()
+                flush_trace()
+                with self.lock:
+                    self.inv, self.index = inv, index
+                sys.stderr.write(
+                    f"inventory-daemon: {len(inv['_meta']['hostvars'])} hosts "
+                    f"refreshed in {time.monotonic() - started:.2f}s\n"
+                )
+
+    class QueryHandler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            request = self.rfile.readline().decode(errors="replace")
+            if not request.strip():
+                return  # a liveness probe (see below) connects and hangs up
+            server: InventoryDaemon = self.server  # set by socketserver
+            with server.lock:
+                inv, index = server.inv, server.index
+            try:
+                self.wfile.write(json.dumps(answer(inv, index, request)).encode())
+            except ValueError as exc:
+                sys.stderr.write(f"inventory-daemon: {exc}\n")
+
+    path = _socket_path()
+    if path is None:
+        sys.stderr.write("inventory-daemon: no private directory for the socket (set INVENTORY_SOCKET)\n")
+        return 1
+    if os.path.lexists(path):
+        if not _own_socket(path):
+            sys.stderr.write(f"inventory-daemon: {path} exists and is not our socket\n")
+            return 1
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(str(path))
+            sys.stderr.write(f"inventory-daemon: already running on {path}\n")
+            return 1
+        except OSError:
+            path.unlink()  # stale socket from a daemon that died
+    interval = _env_int("INVENTORY_REFRESH", 30)
+
+    server = InventoryDaemon(path)
+    os.chmod(path, 0o600)
+    threading.Thread(target=server.refresh_forever, args=(interval,), daemon=True).start()
+    # SIGTERM (systemd, `kill`) unwinds like Ctrl-C so the socket is removed.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    sys.stderr.write(
+        f"inventory-daemon: {len(server.inv['_meta']['hostvars'])} hosts, "
+        f"listening on {path} (refresh every {interval:g}s)\n"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+    return 0
+
+
+def managed_guests() -> dict[str, Any]:
+    """Every guest already in some project's state, for --managed.
+
+    Returns {"guests": {vmid: {"address", "node", "project"}}, "stale": [...],
+    "unavailable": [...]}: project paths served from a last-known-good entry,
+    and those whose pull failed with nothing to fall back on. Uses the same
+    per-project entries (and INVENTORY_CACHE rules) as the inventory itself,
+    so an import run right after an Ansible run pulls nothing.
+    """
+    projects = discover_projects()
+    entries = [_cached_entry(project) for project in projects]
+    pending = [i for i, entry in enumerate(entries) if entry is None]
+    if pending:
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = max(1, min(len(pending), _env_int("INVENTORY_WORKERS", 8)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for i, entry in zip(pending, pool.map(project_entry, [projects[i] for i in pending])):
+                entries[i] = entry
+
+    result: dict[str, Any] = {"guests": {}, "stale": [], "unavailable": []}
+    for project, entry in zip(projects, entries):
+        if entry.get("failed"):
+            result["unavailable"].append(project["path"])
+        elif entry.get("stale"):
+            result["stale"].append(project["path"])
+        for vmid, node, address in entry.get("managed", ()):
+            result["guests"][str(vmid)] = {"address": address, "node": node, "project": project["path"]}
+    return result
+
+
+def cache_stats() -> int:
+    """Print the INVENTORY_CACHE counters as JSON."""
+    try:
+        stats = json.loads(_stats_path().read_text())
+    except (OSError, json.JSONDecodeError):
+        stats = {}
+    served = sum(stats.get(k, 0) for k in ("hit", "stale", "coalesced", "miss"))
+    if served:
+        stats["hit_ratio"] = round(1 - stats.get("miss", 0) / served, 3)
+    print(json.dumps(stats, indent=2, sort_keys=True))
+    return 0
+
+
+def emit(result: Any, **dump_args: Any) -> None:
+    """Print one answer on stdout — the only thing Ansible reads."""
+    with span("emit") as traced:
+        out = json.dumps(result, **dump_args)
+        traced["bytes"] = len(out)
+        print(out)
+
+
 def main() -> None:
-    if "--doctor" in sys.argv:
+    try:
+        _main()
+    finally:
+        flush_trace()
+
+
+def _main() -> None:
+    if "--refresh-cache" in sys.argv:
+        sys.exit(refresh_cache(sys.argv[sys.argv.index("--refresh-cache") + 1]))
+    elif "--cache-stats" in sys.argv:
+        sys.exit(cache_stats())
+    elif "--serve" in sys.argv:
+        sys.exit(serve())
+    elif "--doctor" in sys.argv:
         sys.exit(doctor())
+    elif "--warm-facts" in sys.argv:
+        sys.exit(warm_facts())
+    elif "--managed" in sys.argv:
+        emit(managed_guests(), sort_keys=True)
+    elif "--save-baseline" in sys.argv:
+        args = sys.argv[sys.argv.index("--save-baseline") + 1:]
+        sys.exit(save_baseline(Path(args[0]) if args else _baseline_path()))
+    elif "--changed-since" in sys.argv:
+        sys.exit(changed_since(Path(sys.argv[sys.argv.index("--changed-since") + 1])))
     elif "--host" in sys.argv:
         host = sys.argv[sys.argv.index("--host") + 1]
-        print(json.dumps(build()["_meta"]["hostvars"].get(host, {})))
+        emit(resolve(f"host {host}"))
+    elif "--group" in sys.argv:
+        group = sys.argv[sys.argv.index("--group") + 1]
+        emit(resolve(f"group {group}"))
+    elif "--by-ip" in sys.argv:
+        emit(resolve(f"ip {sys.argv[sys.argv.index('--by-ip') + 1]}"))
+    elif "--by-vmid" in sys.argv:
+        emit(resolve(f"vmid {sys.argv[sys.argv.index('--by-vmid') + 1]}"))
     else:  # --list (default)
-        print(json.dumps(build(), indent=2, sort_keys=True))
+        emit(resolve("list"), indent=2, sort_keys=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""In-process inventory plugin for this repo's Terraform/OpenTofu state.
+
+Same hosts, groups and hostvars as inventory/terraform_state_inventory.py —
+it IS that script, imported instead of forked, so the contract cannot drift.
+"""
+
+from __future__ import annotations
+
+DOCUMENTATION = r"""
+name: terraform_state
+short_description: Hosts from live Terraform/OpenTofu state, without a subprocess
+description:
+  - Runs the repo's C(terraform_state_inventory.py) inside the Ansible process
+    and adds its C(--list) result directly, instead of forking the script and
+    parsing its JSON on stdout.
+  - Host naming, groups (tags, projects, node/VLAN, composites, C(changed)) and
+    hostvars are exactly the script's; its C(INVENTORY_*) environment knobs
+    (cache, daemon, snapshot, direct backend) apply unchanged.
+  - Implements the inventory cache interface, so C(cache_plugin=jsonfile) or
+    C(memory) with a C(cache_timeout) reuses the result across runs.
+  - The config file must be named C(terraform_state.yml) or
+    C(terraform_state.yaml).
+extends_documentation_fragment:
+  - inventory_cache
+options:
+  plugin:
+    description: Token that ensures this is a source file for this plugin.
+    required: true
+    choices: ["homelab.proxmox.terraform_state"]
+  script:
+    description:
+      - Path to C(terraform_state_inventory.py). Relative paths are resolved
+        against the directory of the config file. Terraform projects are
+        discovered relative to the script, so it must be the checkout's copy.
+      - Kept a plain string rather than C(type=path), which Ansible would
+        absolutize against the current directory before it can be resolved
+        against the config file's.
+    type: str
+    default: terraform_state_inventory.py
+"""
+
+EXAMPLES = r"""
+# inventory/terraform_state.yml
+plugin: homelab.proxmox.terraform_state
+cache: true
+cache_plugin: jsonfile
+cache_connection: .ansible_inventory_cache
+cache_timeout: 60
+"""
+
+import importlib.util
+import os
+import sys
+
+from ansible.errors import AnsibleParserError
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable
+
+MODULE_NAME = "terraform_state_inventory"
+
+
+def load_script(path):
+    """Import the inventory script once per process (and per path)."""
+    module = sys.modules.get(MODULE_NAME)
+    if module is not None and os.path.realpath(module.__file__) == os.path.realpath(path):
+        return module
+    spec = importlib.util.spec_from_file_location(MODULE_NAME, path)
+    if spec is None or spec.loader is None:
+        raise AnsibleParserError(f"cannot load inventory script {path}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[MODULE_NAME] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[MODULE_NAME]
+        raise
+    return module
+
+
+class InventoryModule(BaseInventoryPlugin, Cacheable):
+    NAME = "homelab.proxmox.terraform_state"
+    # ansible-core 2.19+ marks plugin-set variables untrusted unless told
+    # otherwise; the script plugin trusts the same data, so match it.
+    trusted_by_default = True
+
+    def verify_file(self, path):
+        return super().verify_file(path) and path.endswith(
+            ("terraform_state.yml", "terraform_state.yaml")
+        )
+
+    def parse(self, inventory, loader, path, cache=True):
+        super().parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        use_cache = self.get_option("cache") and cache
+        update_cache = self.get_option("cache") and not cache
+        result = None
+        if use_cache:
+            try:
+                result = self._cache[cache_key]
+            except KeyError:
+                update_cache = True
+        if result is None:
+            result = self._resolve(path)
+        if update_cache:
+            self._cache[cache_key] = result
+        self._populate(result)
+
+    def _resolve(self, path):
+        script = os.path.join(
+            os.path.dirname(os.path.abspath(path)), os.path.expanduser(self.get_option("script"))
+        )
+        if not os.path.isfile(script):
+            raise AnsibleParserError(f"inventory script not found: {script}")
+        module = load_script(script)
+        try:
+            return module.resolve("list")
+        finally:
+            module.flush_trace()
+
+    def _populate(self, result):
+        """Add a script-shaped {"_meta": {"hostvars"}, group: {...}} result."""
+        for host, hostvars in result.get("_meta", {}).get("hostvars", {}).items():
+            self.inventory.add_host(host)
+            for key, value in hostvars.items():
+                self.inventory.set_variable(host, key, value)
+        for name, group in result.items():
+            if name == "_meta":
+                continue
+            self.inventory.add_group(name)
+            for host in group.get("hosts", []):
+                self.inventory.add_host(host, group=name)
+            for key, value in group.get("vars", {}).items():
+                self.inventory.set_variable(name, key, value)
+            for child in group.get("children", []):
+                self.inventory.add_group(child)
+                self.inventory.add_child(name, child)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for import_proxmox.py against mock_proxmox_api.py
+
+Not used by any import workflow. For each guest count it starts the mock
+API as its own process (synthetic guests spread over --nodes, with the
+given latency and fault injection, so serving them doesn't compete with
+anything measured here), points import_proxmox.py at a scratch
+Terraform tree through PROXMOX_IMPORT_TF_ROOT and runs it end to end as a
+fresh process, the way the Makefile targets do (minus the Terraform state
+check, --no-state: there is no state to pull):
+
+  import   --all --import-blocks into empty instances files with an empty
+           config cache: discovery, every config fetched, parsed and
+           rendered, both tfvars files and imports.tf written
+  update   --all --update over what `import` wrote: tfvars index load,
+           every config refetched (writing runs don't reuse the cache),
+           every entry rewritten in place
+  drift    --drift over the same files: every config refetched, parsed
+           and compared with the tfvars
+
+Reported per case: guests/sec (guests / median wall time), median wall,
+peak RSS (max over runs) and API requests per run as counted by the mock.
+
+Usage:
+  python3 bench_import.py [--sizes 10,500,5000] [--nodes pve1,pve2,pve3]
+      [--latency 5] [--jitter 0] [--fail-rate 0] [--throttle-rate 0]
+      [--workers 8] [--per-node 4] [--runs 3]
+      [--save FILE] [--baseline FILE] [--threshold 0.25]
+
+--save writes the results as JSON; with --baseline, any case whose
+guests/sec dropped or whose peak RSS grew by more than --threshold against
+the saved run fails the command (exit 1). Backs `make import-bench`.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORT_SCRIPT = os.path.join(SCRIPT_DIR, "import_proxmox.py")
+MOCK_SCRIPT = os.path.join(SCRIPT_DIR, "mock_proxmox_api.py")
+PROJECTS = ("lxc", "talos")
+
+# Exit codes each case may end with; anything else means a broken run.
+CASES = {
+    "import": (["--all", "--import-blocks"], (0,)),
+    "update": (["--all", "--update"], (0,)),
+    "drift": (["--drift"], (0, 2)),
+}
+
+
+def run_measured(argv, env, log):
+    """Run argv once with stderr to ``log``.
+
+    Returns:
+        tuple: (wall seconds, peak RSS bytes, exit code)
+    """
+    started = time.perf_counter()
+    proc = subprocess.Popen(argv, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = 0  # reaped above; keep Popen from waiting again
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return elapsed, rss, os.waitstatus_to_exitcode(status)
+
+
+def reset_tree(root, cache_dir):
+    """Empty instances directories and config cache under ``root``."""
+    for project in PROJECTS:
+        shutil.rmtree(os.path.join(root, project), ignore_errors=True)
+        os.makedirs(os.path.join(root, project, "instances"))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def start_mock(args, size):
+    """Start mock_proxmox_api.py with ``size`` guests on a free port.
+
+    Returns:
+        tuple: (Popen, API base URL)
+    """
+    proc = subprocess.Popen(
+        [
+            sys.executable, MOCK_SCRIPT,
+            "--port", "0",
+            "--guests", str(size),
+            "--nodes", ",".join(args.nodes),
+            "--latency", str(args.latency),
+            "--jitter", str(args.jitter),
+            "--fail-rate", str(args.fail_rate),
+            "--throttle-rate", str(args.throttle_rate),
+            "--seed", str(args.seed),
+        ],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    # serve() announces itself with the URL once the socket is bound.
+    line = proc.stderr.readline()
+    if " on " not in line:
+        proc.kill()
+        raise SystemExit(f"mock_proxmox_api.py failed to start: {line.strip()}")
+    return proc, line.rsplit(" on ", 1)[1].strip()
+
+
+def mock_requests(url):
+    """API requests the mock has served so far."""
+    stats_url = url.rsplit("/api2/json", 1)[0] + "/_mock/stats"
+    with urllib.request.urlopen(stats_url) as resp:
+        return json.load(resp)["data"]["requests"]
+
+
+def bench_size(args, size):
+    """Run every case against a ``size``-guest mock.
+
+    Returns:
+        dict: case@size → {"rate", "wall", "rss", "requests"}
+    """
+    mock, url = start_mock(args, size)
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-import-") as root:
+            cache_dir = os.path.join(root, "cache")
+            env = dict(os.environ, PROXMOX_IMPORT_TF_ROOT=root)
+            base = [
+                sys.executable, IMPORT_SCRIPT,
+                "--api-url", url,
+                "--api-token-id", "bench@pve!token",
+                "--api-token-secret", "x",
+                "--workers", str(args.workers),
+                "--per-node", str(args.per_node),
+                "--cache-dir", cache_dir,
+                "--no-state",
+            ]
+            with open(os.path.join(root, "stderr.log"), "w+") as log:
+                for name, (flags, ok) in CASES.items():
+                    samples = []
+                    for _ in range(args.runs):
+                        if name == "import":
+                            reset_tree(root, cache_dir)
+                        before = mock_requests(url)
+                        log.seek(0)
+                        log.truncate()
+                        wall, rss, code = run_measured(base + flags, env, log)
+                        if code not in ok:
+                            log.seek(0)
+                            sys.stderr.write(log.read())
+                            raise SystemExit(f"{name}@{size}: import_proxmox.py exited {code}")
+                        samples.append((wall, rss, mock_requests(url) - before))
+                    wall = statistics.median(s[0] for s in samples)
+                    results[f"{name}@{size}"] = {
+                        "rate": size / wall,
+                        "wall": wall,
+                        "rss": max(s[1] for s in samples),
+                        "requests": samples[-1][2],
+                    }
+    finally:
+        mock.terminate()
+        mock.wait()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Regression lines for cases slower or bigger than ``baseline``."""
+    regressions = []
+    for case, now in sorted(results.items()):
+        before = baseline.get(case)
+        if before is None:
+            continue
+        if now["rate"] < before["rate"] * (1 - threshold):
+            regressions.append(
+                f"{case} guests/s: {before['rate']:.4g} -> {now['rate']:.4g} "
+                f"({now['rate'] / before['rate'] - 1:.0%})"
+            )
+        if now["rss"] > before["rss"] * (1 + threshold):
+            regressions.append(
+                f"{case} rss: {before['rss']:.4g} -> {now['rss']:.4g} "
+                f"(+{now['rss'] / before['rss'] - 1:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import_proxmox.py against the mock API")
+    parser.add_argument(
+        "--sizes",
+        type=lambda v: [int(n) for n in v.split(",")],
+        default=[10, 500, 5000],
+        help="Comma-separated guest counts (default: 10,500,5000)",
+    )
+    parser.add_argument(
+        "--nodes",
+        type=lambda v: [n for n in v.split(",") if n],
+        default=["pve1", "pve2", "pve3"],
+        help="Comma-separated mock node names (default: pve1,pve2,pve3)",
+    )
+    parser.add_argument("--latency", type=float, default=5, help="Mock latency per request in ms (default: 5)")
+    parser.add_argument("--jitter", type=float, default=0, help="Extra random mock latency of 0..MS")
+    parser.add_argument("--fail-rate", type=float, default=0, help="Fraction of config requests failing with 5xx")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="Fraction of config requests answered 429")
+    parser.add_argument("--workers", type=int, default=8, help="import_proxmox.py --workers (default: 8)")
+    parser.add_argument("--per-node", type=int, default=4, help="import_proxmox.py --per-node (default: 4)")
+    parser.add_argument("--runs", type=int, default=3, help="Processes per case (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Mock fixture and fault injection seed")
+    parser.add_argument("--save", metavar="FILE", help="Write results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="Fail on regressions against a saved run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed guests/sec drop or peak RSS growth vs --baseline (default: 0.25)",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<14}{'guests/s':>10}{'wall':>10}{'peak rss':>11}{'requests':>10}")
+    for size in args.sizes:
+        for case, r in bench_size(args, size).items():
+            results[case] = r
+            print(
+                f"{case:<14}{r['rate']:>10.0f}{r['wall'] * 1000:>8.0f}ms"
+                f"{r['rss'] / 1e6:>9.1f}MB{r['requests']:>10}"
+            )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    for line in regressions:
+        print(f"REGRESSION: {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,30 +18,78 @@
     --api-url https://proxmox.example.com:8006/api2/json \\
     --api-token-id user@pam!token \\
     --api-token-secret UUID
+
+Bulk mode (--all) discovers guests with a single /cluster/resources call,
+narrows them with --type/--node/--tag/--vmid-range, skips every VMID or
+hostname already present in instances/*.auto.tfvars, fetches the remaining
+configs concurrently and appends all blocks to each tfvars file in one write:
+  python3 import_proxmox.py --all --type lxc --tag docker --vmid-range 100-199 \\
+    --api-url ... --api-token-id ... --api-token-secret ...
+
+All API traffic goes through ProxmoxClient: pooled keep-alive connections
+with TLS session resumption, --workers requests in flight cluster-wide and
+--per-node per node, a --timeout on every socket operation and --retries
+with exponential backoff on timeouts, 429 and 5xx. mock_proxmox_api.py in
+this directory serves a synthetic cluster to run all of it against, and
+bench_import.py measures guests/sec and peak memory against it.
+
+Watch mode (--watch) polls /cluster/tasks instead of rescanning the cluster
+and imports just the guests new vzcreate/qmcreate, vzrestore/qmrestore and
+vzclone/qmclone tasks leave behind, resuming from a persisted cursor:
+  python3 import_proxmox.py --watch --import-blocks --interval 30 \\
+    --api-url ... --api-token-id ... --api-token-secret ...
+
+Guests already in Terraform state are skipped before any Proxmox API call:
+the VMID → resource address index comes from the Ansible inventory script
+(terraform_state_inventory.py --managed), which reads the same `terragrunt
+state pull` output and shares its per-project cache; --no-state skips it.
+
+Raw guest configs are cached under $XDG_CACHE_HOME/proxmox-import. Only
+--dry-run reuses an entry, for --cache-ttl seconds (bulk mode also checks
+the guest's /cluster/resources entry), so repeated previews don't refetch;
+runs that write tfvars or imports.tf always read live configs and refresh
+the cache. --no-cache bypasses it.
 """
 
 import argparse
+import contextlib
+import glob
+import http.client
 import json
 import os
+import random
+import re
 import ssl
+import subprocess
 import sys
-import urllib.request
-
-# Relative paths from this script to each Terraform project
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+# Terraform projects live next to this script's directory;
+# PROXMOX_IMPORT_TF_ROOT points the tool at another tree (bench_import.py).
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TF_ROOT = os.environ.get("PROXMOX_IMPORT_TF_ROOT") or os.path.join(SCRIPT_DIR, "..")
+INVENTORY_SCRIPT = os.path.join(
+    SCRIPT_DIR, "..", "..", "ansible", "inventory", "terraform_state_inventory.py"
+)
 
 RESOURCE_CONFIG = {
     "lxc": {
-        "tf_dir": os.path.join(SCRIPT_DIR, "..", "lxc"),
+        "tf_dir": os.path.join(TF_ROOT, "lxc"),
         "tfvars_file": "instances/lxc.auto.tfvars",
+        "tfvars_variable": "lxc_instances",
         "proxmox_api_type": "lxc",
         "bpg_resource": "proxmox_virtual_environment_container.container",
         "module_path": "module.lxc[0]",
         "var_files": ["-var-file=terraform.tfvars.secret"],
     },
     "talos-vm": {
-        "tf_dir": os.path.join(SCRIPT_DIR, "..", "talos"),
+        "tf_dir": os.path.join(TF_ROOT, "talos"),
         "tfvars_file": "instances/talos.auto.tfvars",
+        "tfvars_variable": "talos_instances",
         "proxmox_api_type": "qemu",
         "bpg_resource": "proxmox_virtual_environment_vm.vm",
         "module_path": "module.talos[0]",
@@ -52,51 +100,421 @@
     },
 }
 
+# Proxmox guest kind (/cluster/resources "type") → RESOURCE_CONFIG key
+API_TYPES = {rc["proxmox_api_type"]: kind for kind, rc in RESOURCE_CONFIG.items()}
+
+# API client: concurrent requests cluster-wide / per node, socket timeout
+# (seconds), retries after the first attempt and their backoff (seconds)
+DEFAULT_WORKERS = 8
+DEFAULT_PER_NODE = 4
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Config cache: default reuse window, then eviction by age and total size
+DEFAULT_CACHE_TTL = 900
+CACHE_MAX_AGE = 7 * 24 * 3600
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
 
 # ---------------------------------------------------------------------------
 # Proxmox API
 # ---------------------------------------------------------------------------
 
-def fetch_config(api_url, token_id, token_secret, node, vmid, api_type):
-    """Fetch resource configuration from Proxmox API.
+class ProxmoxAPIError(Exception):
+    """A Proxmox API request that failed for good (after any retries)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _ResumingHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection that offers the client's last TLS session on connect.
+
+    A fresh keep-alive connection (pool growth, or a server that closed an
+    idle one) then costs an abbreviated handshake instead of a full one.
+    """
+
+    def __init__(self, client, **kwargs):
+        super().__init__(client.host, client.port, context=client.ssl_context, **kwargs)
+        self._client = client
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        self.sock = self._context.wrap_socket(
+            self.sock, server_hostname=self.host, session=self._client.tls_session
+        )
+
+
+class ProxmoxClient:
+    """Pooled, retrying client for the Proxmox VE API.
+
+    - keep-alive connections are pooled and reused across threads, and new
+      TLS connections resume the last session
+    - at most ``max_connections`` requests are in flight cluster-wide and at
+      most ``per_node`` against any one node (the /nodes/{node}/... proxying
+      is what loads pveproxy on the target node)
+    - every socket operation has a timeout
+    - connection errors, timeouts, 429 and 5xx are retried with exponential
+      backoff and jitter (Retry-After is honoured); other errors raise
+      ProxmoxAPIError immediately
 
     Args:
         api_url: Full API URL (e.g. https://host:8006/api2/json)
         token_id: API token ID (user@realm!tokenname)
         token_secret: API token secret (UUID)
+        timeout: Per socket operation timeout in seconds
+        retries: Retries per request after the first attempt
+        max_connections: Concurrent requests cluster-wide (= pool size)
+        per_node: Concurrent requests per Proxmox node
+        backoff: Base delay in seconds for the exponential backoff
+    """
+
+    def __init__(
+        self,
+        api_url,
+        token_id,
+        token_secret,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        max_connections=DEFAULT_WORKERS,
+        per_node=DEFAULT_PER_NODE,
+        backoff=DEFAULT_BACKOFF,
+    ):
+        parts = urllib.parse.urlsplit(api_url.rstrip("/"))
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path
+        self.headers = {
+            "Authorization": f"PVEAPIToken={token_id}={token_secret}",
+            "Accept": "application/json",
+        }
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.per_node = per_node
+
+        # Proxmox ships self-signed certificates by default
+        self.ssl_context = ssl.create_default_context()
+        self.ssl_context.check_hostname = False
+        self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.tls_session = None
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._node_slots = {}
+        self.stats = {"requests": 0, "connections": 0, "retries": 0}
+
+    # -- connection pool ----------------------------------------------------
+
+    def _checkout(self):
+        """Return (connection, reused) — an idle pooled one if available."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+            self.stats["connections"] += 1
+        if self.https:
+            return _ResumingHTTPSConnection(self, timeout=self.timeout), False
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def _checkin(self, conn, resp):
+        if resp.will_close:
+            conn.close()
+            return
+        if self.https and conn.sock is not None:
+            self.tls_session = conn.sock.session
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self):
+        """Close every idle pooled connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _node_slot(self, node):
+        with self._lock:
+            slot = self._node_slots.get(node)
+            if slot is None:
+                slot = self._node_slots[node] = threading.BoundedSemaphore(self.per_node)
+            return slot
+
+    # -- requests -----------------------------------------------------------
+
+    def get(self, path, node=None):
+        """GET one API path and return its ``data`` member.
+
+        Args:
+            path: Path below the API URL (e.g. 'cluster/resources?type=vm')
+            node: Node the request is served by, for the per-node limit
+
+        Raises:
+            ProxmoxAPIError: on a non-retryable error or once retries run out
+        """
+        # Node slot first, so a request queued behind a busy node does not
+        # hold one of the cluster-wide slots while it waits.
+        with self._node_slot(node) if node else contextlib.nullcontext():
+            with self._slots:
+                return self._get(f"{self.base_path}/{path}")
+
+    def _get(self, url):
+        attempt = 0
+        while True:
+            conn, reused = self._checkout()
+            delay = None
+            try:
+                conn.request("GET", url, headers=self.headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if reused:
+                    # The server closed an idle keep-alive connection; not a
+                    # real failure, so retry on another one without counting.
+                    continue
+                status, error = None, f"{type(e).__name__}: {e}"
+            else:
+                self._checkin(conn, resp)
+                with self._lock:
+                    self.stats["requests"] += 1
+                if resp.status == 200:
+                    try:
+                        return json.loads(body).get("data") or {}
+                    except ValueError:
+                        raise ProxmoxAPIError("Error decoding JSON from API response", 200)
+                status, error = resp.status, f"HTTP Error: {resp.status} {resp.reason}"
+                if status not in RETRY_STATUSES:
+                    raise ProxmoxAPIError(error, status)
+                delay = _retry_after(resp)
+
+            if attempt >= self.retries:
+                raise ProxmoxAPIError(error, status)
+            attempt += 1
+            with self._lock:
+                self.stats["retries"] += 1
+            if delay is None:
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            time.sleep(min(delay, MAX_BACKOFF))
+
+
+def _retry_after(resp):
+    """Seconds from a Retry-After header, or None."""
+    try:
+        return max(0.0, float(resp.getheader("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+
+def client_from_args(args):
+    """Build a ProxmoxClient from the parsed command-line options."""
+    return ProxmoxClient(
+        args.api_url,
+        args.api_token_id,
+        args.api_token_secret,
+        timeout=args.timeout,
+        retries=args.retries,
+        max_connections=args.workers,
+        per_node=args.per_node,
+    )
+
+
+def fetch_config(client, node, vmid, api_type, cache=None):
+    """Fetch resource configuration from Proxmox API.
+
+    Args:
+        client: ProxmoxClient
         node: Proxmox node name
         vmid: VM/container ID
         api_type: 'lxc' or 'qemu'
+        cache: Optional ConfigCache
 
     Returns:
         dict: Resource configuration from Proxmox API
     """
-    base_url = api_url.rstrip("/")
-    url = f"{base_url}/nodes/{node}/{api_type}/{vmid}/config"
+    try:
+        return get_config(client, cache, node, api_type, vmid)
+    except ProxmoxAPIError as e:
+        sys.stderr.write(f"{e}\n")
+        sys.exit(1)
 
-    headers = {
-        "Authorization": f"PVEAPIToken={token_id}={token_secret}",
-        "Content-Type": "application/json",
-    }
 
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
+def fetch_configs(client, guests, workers, cache=None, signatures=None):
+    """Fetch guest configs concurrently, collecting failures instead of aborting.
+
+    Args:
+        client: ProxmoxClient
+        guests: (kind, node, vmid, name) tuples
+        workers: Thread pool size
+        cache: Optional ConfigCache
+        signatures: Optional vmid → resource_signature() for cache revalidation
 
+    Returns:
+        list: (guest, config, error) tuples in the order of ``guests``;
+        exactly one of config/error is set.
+    """
+    def fetch(guest):
+        kind, node, vmid, _ = guest
+        api_type = RESOURCE_CONFIG[kind]["proxmox_api_type"]
+        signature = signatures.get(vmid) if signatures else None
+        try:
+            config = get_config(client, cache, node, api_type, vmid, signature)
+        except ProxmoxAPIError as e:
+            return guest, None, str(e)
+        if not config:
+            return guest, None, "no configuration returned"
+        return guest, config, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(guests)))) as pool:
+        return list(pool.map(fetch, guests))
+
+
+def list_guests(client):
+    """List every guest in the cluster with one /cluster/resources call.
+
+    Returns:
+        list: Resource dicts (id, type, vmid, node, name, tags, template, ...)
+    """
+    return client.get("cluster/resources?type=vm") or []
+
+
+# ---------------------------------------------------------------------------
+# Config cache
+# ---------------------------------------------------------------------------
+
+# /cluster/resources fields that change whenever a guest is renamed,
+# re-tagged, resized, migrated, locked or templated
+SIGNATURE_KEYS = ("node", "name", "tags", "maxcpu", "maxmem", "maxdisk", "lock", "template")
+
+
+def resource_signature(resource):
+    """The part of a /cluster/resources entry a cached config is checked against."""
+    return [resource.get(k) for k in SIGNATURE_KEYS]
+
+
+def config_path(node, api_type, vmid):
+    return f"nodes/{node}/{api_type}/{vmid}/config"
+
+
+class ConfigCache:
+    """On-disk cache of raw guest configs, keyed by node, type and VMID.
+
+    Proxmox has no conditional GET for guest configs, so an entry is reused
+    while it is younger than ``ttl`` (0 forces a refetch, which main() sets
+    for every run that writes files) and, when the caller has one, the
+    guest's /cluster/resources signature still matches the one recorded with
+    it. Every refetch compares the config ``digest`` with the cached one, so a
+    run can tell how many configs really changed. prune() drops entries older
+    than CACHE_MAX_AGE, then the oldest ones until the directory is below
+    CACHE_MAX_BYTES.
+
+    Args:
+        directory: Cache directory (one JSON file per guest)
+        ttl: Seconds an entry may be reused
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self.stats = {"hits": 0, "fetched": 0, "changed": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _file(self, node, api_type, vmid):
+        return os.path.join(self.directory, f"{node}-{api_type}-{vmid}.json")
+
+    def fetch(self, client, node, api_type, vmid, signature=None):
+        """Return a guest config, from the cache while it is still valid.
+
+        Raises:
+            ProxmoxAPIError: from the client when the config has to be fetched
+        """
+        path = self._file(node, api_type, vmid)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if (
+            entry
+            and time.time() - entry.get("fetched", 0) < self.ttl
+            and (signature is None or entry.get("signature") == signature)
+        ):
+            with self._lock:
+                self.stats["hits"] += 1
+            return entry["config"]
+
+        config = client.get(config_path(node, api_type, vmid), node=node)
+        with self._lock:
+            self.stats["fetched"] += 1
+            if entry and entry.get("digest") != config.get("digest"):
+                self.stats["changed"] += 1
+        if config:
+            entry = {
+                "digest": config.get("digest"),
+                "signature": signature,
+                "fetched": time.time(),
+                "config": config,
+            }
+            # Best effort: a full or read-only cache dir must not fail the import
+            with contextlib.suppress(OSError):
+                _write_atomic(path, json.dumps(entry), self.directory, durable=False)
+        return config
+
+    def prune(self):
+        """Evict entries by age, then by total size (oldest first)."""
+        now = time.time()
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - st.st_mtime > CACHE_MAX_AGE:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= CACHE_MAX_BYTES:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            total -= size
+
+
+def _endpoint_key(client):
+    """File-name-safe host_port of the API endpoint."""
+    return re.sub(r"[^A-Za-z0-9.-]", "_", f"{client.host}_{client.port or ''}")
+
+
+def cache_from_args(args, client):
+    """Build the ConfigCache for this API endpoint, or None when disabled."""
+    if args.no_cache or args.cache_ttl <= 0:
+        return None
+    base = args.cache_dir or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "proxmox-import"
+    )
+    # One subdirectory per API endpoint so two clusters never share entries
     try:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, context=ctx) as resp:
-            data = json.loads(resp.read().decode())
-            return data.get("data", {})
-    except urllib.error.HTTPError as e:
-        sys.stderr.write(f"HTTP Error: {e.code} {e.reason}\n")
-        sys.exit(1)
-    except urllib.error.URLError as e:
-        sys.stderr.write(f"URL Error: {e.reason}\n")
-        sys.exit(1)
-    except json.JSONDecodeError:
-        sys.stderr.write("Error decoding JSON from API response\n")
-        sys.exit(1)
+        return ConfigCache(os.path.join(base, _endpoint_key(client)), args.cache_ttl)
+    except OSError as e:
+        sys.stderr.write(f"Config cache disabled: {e}\n")
+        return None
+
+
+def get_config(client, cache, node, api_type, vmid, signature=None):
+    """Fetch one guest config through the cache when there is one."""
+    if cache is not None:
+        return cache.fetch(client, node, api_type, vmid, signature)
+    return client.get(config_path(node, api_type, vmid), node=node)
 
 
 # ---------------------------------------------------------------------------
@@ -126,16 +544,6 @@ def parse_disk_size_gb(size_str):
         return 0
 
 
-def parse_net_field(net_str, field):
-    """Extract a named field from a Proxmox net0/net1 string.
-
-    Example net_str: 'name=eth0,bridge=vmbr0,gw=10.10.0.1,hwaddr=BC:...,ip=10.10.0.14/24,tag=10'
-    """
-    if not net_str or f"{field}=" not in net_str:
-        return None
-    return net_str.split(f"{field}=")[1].split(",")[0]
-
-
 def parse_tags(config):
     """Parse Proxmox tags string into a Python list."""
     raw = config.get("tags", "")
@@ -145,63 +553,257 @@ def parse_tags(config):
     return [t.strip() for t in raw.split(sep) if t.strip()]
 
 
-def find_largest_disk(config):
-    """Find the largest disk attached to a QEMU VM and return its size in GB."""
-    max_gb = 0
+# ---------------------------------------------------------------------------
+# Property strings (net*, ipconfig*, mp*, rootfs, disks)
+# ---------------------------------------------------------------------------
+
+# Config keys holding property strings; rootfs is the only one without an index
+_DEVICE_KEY_RE = re.compile(r"(rootfs)\Z|(net|ipconfig|mp|scsi|virtio|sata|ide)(\d+)\Z")
+_DISK_BUSES = ("scsi", "virtio", "sata", "ide")
+
+# Key naming the MAC in a QEMU net string ('virtio=BC:24:11:..,bridge=vmbr0')
+QEMU_NIC_MODELS = ("virtio", "e1000", "e1000e", "rtl8139", "vmxnet3")
+
+# Parsed guests by config digest; a digest identifies the config content
+PARSE_CACHE_SIZE = 16384
+_parsed_guests = {}
+# Config key → (device kind, index) or None; the key set repeats across guests
+_device_keys = {}
+
+
+def parse_property_string(value, default_key):
+    """Split one Proxmox property string into a dict in a single pass.
+
+    A leading item without '=' is stored under ``default_key`` (the volume
+    of a disk or mountpoint).
+
+    Example: 'local-lvm:vm-100-disk-0,size=8G' →
+        {'volume': 'local-lvm:vm-100-disk-0', 'size': '8G'}
+    """
+    items = value.split(",")
+    if "=" in items[0]:
+        props = {}
+    else:
+        props = {default_key: items.pop(0)}
+    props.update(item.split("=", 1) for item in items if "=" in item)
+    return props
+
+
+def parse_guest(config):
+    """Structured view of every NIC, IP config, disk and mountpoint of a guest.
+
+    One pass over the config keys, one split per property string. The result
+    is memoised by the config's ``digest``, so the generators, the drift scan
+    and repeated runs over the same configs parse each one once.
+
+    Returns:
+        dict: {
+            "nics":       [{"index", "mac", "bridge", "ip", "gw", "tag", ...}],
+            "ipconfig":   {index: {"ip", "gw", ...}},
+            "disks":      [{"key", "bus", "index", "volume", "size_gb", ...}],  # no CD-ROMs
+            "rootfs":     {"volume", "size_gb", ...} or None,
+            "mountpoints": [{"index", "volume", "mp", "size_gb", ...}],
+        }
+        Lists are ordered by device index.
+    """
+    digest = config.get("digest")
+    if digest is not None:
+        parsed = _parsed_guests.get(digest)
+        if parsed is not None:
+            return parsed
+
+    nics, ipconfig, disks, mountpoints = [], {}, [], []
+    rootfs = None
     for key, value in config.items():
-        if not any(key.startswith(p) for p in ("scsi", "virtio", "sata", "ide")):
-            continue
-        if "size=" not in value:
+        device = _device_keys.get(key, False)
+        if device is False:
+            m = _DEVICE_KEY_RE.match(key)
+            device = _device_keys[key] = m and (m.group(1) or m.group(2), int(m.group(3) or 0))
+        if not device or not isinstance(value, str):
             continue
-        size_str = value.split("size=")[1].split(",")[0]
-        gb = parse_disk_size_gb(size_str)
-        if gb > max_gb:
-            max_gb = gb
-    return max_gb or 32  # fallback
+        kind, index = device
+        if kind == "rootfs":
+            rootfs = parse_property_string(value, "volume")
+            rootfs["size_gb"] = parse_disk_size_gb(rootfs.get("size"))
+        elif kind == "net":
+            nic = parse_property_string(value, "model")
+            nic["index"] = index
+            mac = nic.get("hwaddr") or next(
+                (nic[model] for model in QEMU_NIC_MODELS if model in nic), None
+            )
+            nic["mac"] = mac.upper() if mac and ":" in mac else None
+            nics.append(nic)
+        elif kind == "ipconfig":
+            ipconfig[index] = parse_property_string(value, "ip")
+        elif kind == "mp":
+            mp = parse_property_string(value, "volume")
+            mp["index"] = index
+            mp["size_gb"] = parse_disk_size_gb(mp.get("size"))
+            mountpoints.append(mp)
+        else:
+            disk = parse_property_string(value, "volume")
+            if disk.get("media") == "cdrom":
+                continue
+            disk["key"], disk["bus"], disk["index"] = key, kind, index
+            disk["size_gb"] = parse_disk_size_gb(disk.get("size"))
+            disks.append(disk)
+
+    parsed = {
+        "nics": sorted(nics, key=lambda n: n["index"]),
+        "ipconfig": ipconfig,
+        "disks": sorted(disks, key=lambda d: (_DISK_BUSES.index(d["bus"]), d["index"])),
+        "rootfs": rootfs,
+        "mountpoints": sorted(mountpoints, key=lambda mp: mp["index"]),
+    }
+    if digest is not None:
+        if len(_parsed_guests) >= PARSE_CACHE_SIZE:
+            _parsed_guests.clear()
+        _parsed_guests[digest] = parsed
+    return parsed
+
+
+def largest_disk(guest):
+    """The sized disk with the most GB (first one on a tie), or None."""
+    sized = [d for d in guest["disks"] if d["size_gb"]]
+    return max(sized, key=lambda d: d["size_gb"]) if sized else None
+
+
+def guest_hostname(kind, config, vmid):
+    """Return the Terraform key for a guest: LXC hostname or VM name."""
+    if kind == "lxc":
+        return config.get("hostname", f"ct-{vmid}")
+    return config.get("name", f"vm-{vmid}")
+
+
+def parse_vmid_range(text):
+    """argparse type for --vmid-range: '100-199' or a single '150'."""
+    lo, sep, hi = text.partition("-")
+    try:
+        bounds = (int(lo), int(hi) if sep else int(lo))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid VMID range: {text!r}")
+    if bounds[0] > bounds[1]:
+        raise argparse.ArgumentTypeError(f"empty VMID range: {text!r}")
+    return bounds
 
 
 # ---------------------------------------------------------------------------
 # HCL generators — each returns a tfvars block string
 # ---------------------------------------------------------------------------
+#
+# *_fields() normalise a raw Proxmox config into the tfvars attributes, in
+# block order; the generators render those and the drift scan compares them
+# against existing entries. None means "not derivable from the config".
+
+def primary_nic(guest):
+    """net0, or the lowest-numbered NIC if there is no net0; {} without NICs."""
+    return guest["nics"][0] if guest["nics"] else {}
+
+
+def lxc_fields(config, vmid, hostname):
+    """Normalised tfvars attributes for an LXC container."""
+    guest = parse_guest(config)
+    nic = primary_nic(guest)
+    rootfs = guest["rootfs"]
+    vlan_tag = nic.get("tag")
+    onboot = config.get("onboot", 0) == 1
 
-def generate_lxc_hcl(config, vmid, hostname):
-    """Generate tfvars block for an LXC container."""
-    net0 = config.get("net0", "")
-    ip = parse_net_field(net0, "ip") or "dhcp"
-    gw = parse_net_field(net0, "gw") or ""
-    mac = parse_net_field(net0, "hwaddr") or ""
-    vlan_tag = parse_net_field(net0, "tag")
-
-    rootfs = config.get("rootfs", "")
-    disk_gb = 8
-    if "size=" in rootfs:
-        disk_gb = parse_disk_size_gb(rootfs.split("size=")[1].split(",")[0])
-
-    tags = parse_tags(config)
+    return {
+        "hostname": hostname,
+        "vmid": vmid,
+        "ip": nic.get("ip") or "dhcp",
+        "gw": nic.get("gw") or None,
+        "mac": nic.get("mac"),
+        "cores": config.get("cores", 1),
+        "memory": config.get("memory", 512),
+        "swap": config.get("swap", 512),
+        "disk_size": rootfs["size_gb"] if rootfs and "size" in rootfs else 8,
+        "unprivileged": True,
+        "start": onboot,
+        "onboot": onboot,
+        "tag": int(vlan_tag) if vlan_tag else None,
+        "tags": parse_tags(config),
+    }
+
+
+def talos_vm_fields(config, vmid, hostname):
+    """Normalised tfvars attributes for a Talos VM."""
+    guest = parse_guest(config)
+    nic = primary_nic(guest)
+    # Talos VMs may not have ipconfig0 (no cloud-init)
+    ipconfig = guest["ipconfig"].get(nic.get("index", 0), {})
+    disk = largest_disk(guest)
+    vlan_tag = nic.get("tag")
     onboot = config.get("onboot", 0) == 1
 
-    lines = [
-        "  {",
-        f'    hostname         = "{hostname}"',
-        f"    vmid             = {vmid}",
-        f'    ip               = "{ip}"',
-    ]
-    if gw:
-        lines.append(f'    gw               = "{gw}"')
-    if mac:
-        lines.append(f'    mac              = "{mac}"')
-    lines += [
-        f"    cores            = {config.get('cores', 1)}",
-        f"    memory           = {config.get('memory', 512)}",
-        f"    swap             = {config.get('swap', 512)}",
-        f"    disk_size        = {disk_gb}",
-        f"    unprivileged     = true",
-        f"    start            = {str(onboot).lower()}",
-        f"    onboot           = {str(onboot).lower()}",
+    return {
+        "hostname": hostname,
+        "vmid": vmid,
+        "ip": ipconfig.get("ip"),
+        "gw": ipconfig.get("gw"),
+        "mac": nic.get("mac"),
+        "cores": config.get("cores", 2),
+        "memory": config.get("memory", 6144),
+        "disk_size": disk["size_gb"] if disk else 32,
+        "onboot": onboot,
+        "start": onboot,
+        "tags": parse_tags(config),
+        "tag": int(vlan_tag) if vlan_tag else None,
+    }
+
+
+def unmodelled_devices(guest, modelled_disk=None):
+    """Comment lines for devices the single-NIC/single-disk schemas can't hold.
+
+    Extra NICs, mountpoints and additional disks would otherwise be dropped
+    silently; listing them in the generated block makes the import reviewer
+    decide (and makes a later plan's diff unsurprising).
+    """
+    lines = []
+    for nic in guest["nics"][1:]:
+        ipconfig = guest["ipconfig"].get(nic["index"], {})
+        details = [
+            f"{key}={nic[key]}" for key in ("name", "bridge", "ip", "gw", "tag") if nic.get(key)
+        ]
+        details += [f"{key}={ipconfig[key]}" for key in ("ip", "gw") if ipconfig.get(key)]
+        if nic.get("mac"):
+            details.append(f"mac={nic['mac']}")
+        lines.append(f"    # net{nic['index']} not imported (one NIC per guest): {', '.join(details)}")
+    for mp in guest["mountpoints"]:
+        size = f", {mp['size_gb']}G" if mp.get("size") else ""
+        lines.append(
+            f"    # mp{mp['index']} not imported: {mp.get('volume', '?')} at {mp.get('mp', '?')}{size}"
+        )
+    for disk in guest["disks"]:
+        if disk is not modelled_disk and disk["size_gb"]:
+            lines.append(
+                f"    # {disk['key']} not imported (one disk per VM): {disk.get('volume', '?')}, {disk['size_gb']}G"
+            )
+    return lines
+
+
+def _hcl_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return f'"{value}"'
+    if isinstance(value, list):
+        return json.dumps(value)
+    return str(value)
+
+
+def _hcl_lines(fields, width):
+    return [
+        f"    {key.ljust(width)} = {_hcl_value(value)}"
+        for key, value in fields.items()
+        if value is not None
     ]
-    if vlan_tag:
-        lines.append(f"    tag              = {vlan_tag}")
-    lines.append(f"    tags             = {json.dumps(tags)}")
+
+
+def generate_lxc_hcl(config, vmid, hostname):
+    """Generate tfvars block for an LXC container."""
+    lines = ["  {"] + _hcl_lines(lxc_fields(config, vmid, hostname), 16)
+    lines += unmodelled_devices(parse_guest(config))
     lines.append("    preserve_ssh_key = true  # Imported host")
     lines.append("    features = {")
     lines.append("      nesting = true")
@@ -210,41 +812,15 @@ def generate_lxc_hcl(config, vmid, hostname):
     return "\n".join(lines)
 
 
-
-
 def generate_talos_vm_hcl(config, vmid, hostname):
     """Generate tfvars block for a Talos VM."""
-    net0 = config.get("net0", "")
-    ipconfig0 = config.get("ipconfig0", "")
-
-    # Talos VMs may not have ipconfig0 (no cloud-init), fall back to manual entry
-    ip = parse_net_field(ipconfig0, "ip") or "FIXME/24"
-    gw = parse_net_field(ipconfig0, "gw") or "FIXME"
-    mac = _parse_qemu_mac(net0)
-    vlan_tag = parse_net_field(net0, "tag")
-    disk_gb = find_largest_disk(config)
-    tags = parse_tags(config)
-    onboot = config.get("onboot", 0) == 1
-
-    lines = [
-        "  {",
-        f'    hostname     = "{hostname}"',
-        f"    vmid         = {vmid}",
-        f'    ip           = "{ip}"',
-        f'    gw           = "{gw}"',
-    ]
-    if mac:
-        lines.append(f'    mac          = "{mac}"')
-    lines += [
-        f"    cores        = {config.get('cores', 2)}",
-        f"    memory       = {config.get('memory', 6144)}",
-        f"    disk_size    = {disk_gb}",
-        f"    onboot       = {str(onboot).lower()}",
-        f"    start        = {str(onboot).lower()}",
-        f"    tags         = {json.dumps(tags)}",
-    ]
-    if vlan_tag:
-        lines.append(f"    tag          = {vlan_tag}")
+    fields = talos_vm_fields(config, vmid, hostname)
+    # ip and gw are required by the schema; leave a marker to fill in by hand
+    fields["ip"] = fields["ip"] or "FIXME/24"
+    fields["gw"] = fields["gw"] or "FIXME"
+    lines = ["  {"] + _hcl_lines(fields, 12)
+    guest = parse_guest(config)
+    lines += unmodelled_devices(guest, largest_disk(guest))
     lines.append('    talos_role   = "worker"  # VERIFY: set to "controlplane" if applicable')
     lines.append('    bios         = "ovmf"')
     lines.append(f'    description  = "{hostname}"')
@@ -252,62 +828,1053 @@ def generate_talos_vm_hcl(config, vmid, hostname):
     return "\n".join(lines)
 
 
-def _parse_qemu_mac(net0):
-    """Extract MAC address from a QEMU net0 config string.
+# ---------------------------------------------------------------------------
+# File manipulation
+# ---------------------------------------------------------------------------
+
+_VMID_RE = re.compile(r"\bvmid\s*=\s*(\d+)")
+_HOSTNAME_RE = re.compile(r'\bhostname\s*=\s*"([^"]+)"')
+
+# Strings and comments are skipped whole so brackets inside them don't count
+_HCL_TOKEN_RE = re.compile(r'"(?:[^"\\\n]|\\.)*"|#[^\n]*|//[^\n]*|/\*.*?\*/|[\[\]{}]', re.S)
+
+
+_HCL_ATTR_RE = re.compile(
+    r'"(?:[^"\\\n]|\\.)*"|#[^\n]*|//[^\n]*|/\*.*?\*/'
+    r'|(?P<key>[A-Za-z_][\w-]*)\s*=\s*'
+    r'(?P<value>"(?:[^"\\\n]|\\.)*"|\[(?:"(?:[^"\\\n]|\\.)*"|[^\]"])*\]'
+    r'|-?\d+(?:\.\d+)?\b|true\b|false\b|null\b|\{)',
+    re.S,
+)
+_HCL_STRING_RE = re.compile(r'"((?:[^"\\\n]|\\.)*)"')
+
+
+def _hcl_literal(text):
+    """Decode one scalar or flat-list HCL literal into Python."""
+    if text.startswith('"'):
+        return json.loads(text)
+    if text.startswith("["):
+        return [json.loads(f'"{s}"') for s in _HCL_STRING_RE.findall(text)] or [
+            _hcl_literal(t) for t in re.findall(r"-?\d+(?:\.\d+)?|true|false", text)
+        ]
+    if text in ("true", "false"):
+        return text == "true"
+    if text == "null":
+        return None
+    return float(text) if "." in text else int(text)
+
+
+def parse_hcl_attributes(body):
+    """Top-level ``key = value`` pairs of one ``{ ... }`` tfvars entry.
 
-    net0 format: 'virtio=BC:24:11:AA:BB:CC,bridge=vmbr0,...'
+    Handles the literals the instance schemas use: strings, numbers, bools,
+    null and flat lists. Nested objects (e.g. ``features``) are skipped.
     """
-    if not net0 or "=" not in net0:
-        return None
-    mac_part = net0.split("=")[1].split(",")[0]
-    if ":" in mac_part:
-        return mac_part.upper()
-    return None
+    attrs = {}
+    pos = body.index("{") + 1 if "{" in body else 0
+    while True:
+        m = _HCL_ATTR_RE.search(body, pos)
+        if not m:
+            return attrs
+        pos = m.end()
+        if not m.group("key"):
+            continue
+        value = m.group("value")
+        if value != "{":
+            attrs[m.group("key")] = _hcl_literal(value)
+            continue
+        depth = 1
+        for tok in _HCL_TOKEN_RE.finditer(body, pos):
+            if tok.group() == "{":
+                depth += 1
+            elif tok.group() == "}":
+                depth -= 1
+                if not depth:
+                    pos = tok.end()
+                    break
+
+
+class TfvarsError(Exception):
+    """A tfvars file that can't be parsed, or a batch that would break it."""
+
+
+def existing_instances(kind, exclude=()):
+    """Collect VMIDs and hostnames already defined in a project's tfvars.
+
+    Scans every ``instances/*.auto.tfvars`` of the project the resource type
+    belongs to (except the paths in ``exclude``), so guests that are already
+    managed are not imported twice.
+
+    Returns:
+        tuple: (set of int VMIDs, set of hostnames)
+    """
+    rc = RESOURCE_CONFIG[kind]
+    skip = {os.path.abspath(p) for p in exclude}
+    vmids, hostnames = set(), set()
+    pattern = os.path.join(rc["tf_dir"], "instances", "*.auto.tfvars")
+    for path in glob.glob(pattern):
+        if os.path.abspath(path) in skip:
+            continue
+        with open(path, "r") as f:
+            text = f.read()
+        vmids.update(int(v) for v in _VMID_RE.findall(text))
+        hostnames.update(_HOSTNAME_RE.findall(text))
+    return vmids, hostnames
+
+
+def _line_start(text, pos):
+    """Start of the line holding ``pos`` if only whitespace precedes it there."""
+    start = text.rfind("\n", 0, pos) + 1
+    return start if not text[start:pos].strip() else pos
+
+
+class TfvarsFile:
+    """One instances tfvars file, parsed once and rewritten once.
+
+    The file is scanned a single time for the ``variable = [ ... ]`` list and
+    the span of every ``{ ... }`` entry in it, indexed by vmid and hostname.
+    add() queues inserts and in-place updates against that index, rejecting
+    anything that would leave two entries with the same vmid or hostname;
+    commit() renders every queued change in one pass, writes it to a temp
+    file next to the original, keeps the previous content as ``.backup`` and
+    renames the temp file over the original.
+
+    Args:
+        path: tfvars file; created with an empty list if missing
+        variable: Name of the list variable (e.g. 'lxc_instances')
+    """
+
+    def __init__(self, path, variable):
+        self.path = path
+        self.variable = variable
+        try:
+            with open(path, "r") as f:
+                self.original = f.read()
+        except FileNotFoundError:
+            self.original = None
+        self.text = self.original if self.original is not None else f"{variable} = []\n"
+        self.entries = []  # [start, end, vmid, hostname]
+        self.by_vmid = {}
+        self.by_hostname = {}
+        self.inserts = []
+        self.updates = {}
+        self.queued = (set(), set())  # vmids, hostnames added this batch
+        self._parse()
+
+    def _parse(self):
+        text = self.text
+        assign = re.compile(rf"(?:^|\n)[ \t]*{re.escape(self.variable)}[ \t]*=[ \t]*$")
+        depth = 0
+        list_depth = None
+        entry_start = None
+        for m in _HCL_TOKEN_RE.finditer(text):
+            tok = m.group()
+            if len(tok) > 1:
+                continue
+            pos = m.start()
+            if tok in "[{":
+                if list_depth is None and tok == "[" and depth == 0:
+                    if assign.search(text, text.rfind("\n", 0, pos), pos):
+                        list_depth = 1
+                        self.list_open = pos
+                elif list_depth is not None and depth == list_depth and tok == "{":
+                    entry_start = pos
+                depth += 1
+                continue
+            depth -= 1
+            if depth < 0:
+                raise TfvarsError(f"{self.path}: unbalanced '{tok}' at offset {pos}")
+            if list_depth is None:
+                continue
+            if depth == list_depth and tok == "}" and entry_start is not None:
+                self._index(entry_start, pos + 1)
+                entry_start = None
+            elif depth == 0 and tok == "]":
+                self.list_close = pos
+                break
+        else:
+            if list_depth is None:
+                raise TfvarsError(f"{self.path}: no '{self.variable} = [' list found")
+            raise TfvarsError(f"{self.path}: '{self.variable}' list is not closed")
+
+        dupes = [f"vmid {k}" for k, v in self.by_vmid.items() if isinstance(v, list)]
+        dupes += [f"hostname {k}" for k, v in self.by_hostname.items() if isinstance(v, list)]
+        if dupes:
+            raise TfvarsError(
+                f"{self.path} already has duplicate entries (fix these first): "
+                + ", ".join(dupes)
+            )
+
+    def _index(self, start, end):
+        body = self.text[start:end]
+        vmid = _VMID_RE.search(body)
+        hostname = _HOSTNAME_RE.search(body)
+        vmid = int(vmid.group(1)) if vmid else None
+        hostname = hostname.group(1) if hostname else None
+        idx = len(self.entries)
+        self.entries.append((start, end, vmid, hostname))
+        for index, key in ((self.by_vmid, vmid), (self.by_hostname, hostname)):
+            if key is None:
+                continue
+            if key in index:
+                prev = index[key]
+                index[key] = (prev if isinstance(prev, list) else [prev]) + [idx]
+            else:
+                index[key] = idx
+
+    def values(self):
+        """Yield the parsed attributes of every entry, in file order."""
+        for start, end, _, _ in self.entries:
+            yield parse_hcl_attributes(self.text[start:end])
+
+    def add(self, vmid, hostname, block, replace=False):
+        """Queue one generated block.
+
+        A guest whose vmid and hostname are both new is appended. With
+        ``replace``, a guest whose vmid is already present has that entry
+        replaced in place (its hostname may change as long as no other entry
+        uses the new one). Everything else is a duplicate.
+
+        Returns:
+            str: 'insert' or 'update'
+
+        Raises:
+            TfvarsError: the block would duplicate a vmid or hostname
+        """
+        queued_vmids, queued_hostnames = self.queued
+        if vmid in queued_vmids or hostname in queued_hostnames:
+            raise TfvarsError(f"{hostname} (VMID {vmid}) appears twice in this batch")
+
+        by_vmid = self.by_vmid.get(vmid)
+        by_hostname = self.by_hostname.get(hostname)
+        if by_vmid is None and by_hostname is None:
+            self.inserts.append((vmid, hostname, block))
+            queued_vmids.add(vmid)
+            queued_hostnames.add(hostname)
+            return "insert"
+        if replace and by_vmid is not None and by_hostname in (None, by_vmid):
+            self.updates[by_vmid] = (vmid, hostname, block)
+            queued_vmids.add(vmid)
+            queued_hostnames.add(hostname)
+            return "update"
+        if by_vmid is not None:
+            owner = self.entries[by_vmid][3]
+            raise TfvarsError(f"VMID {vmid} is already defined (as {owner}) in {self.path}")
+        owner = self.entries[by_hostname][2]
+        raise TfvarsError(f"hostname {hostname} is already defined (VMID {owner}) in {self.path}")
+
+    def render(self):
+        """Return the file content with every queued change applied."""
+        text = self.text
+        out = []
+        pos = 0
+        for idx in sorted(self.updates):
+            start, end, _, _ = self.entries[idx]
+            start = _line_start(text, start)
+            if text[end:end + 1] == ",":
+                end += 1
+            out.append(text[pos:start])
+            out.append(self.updates[idx][2].rstrip("\n").lstrip("\n"))
+            pos = end
+
+        if self.inserts:
+            close = self.list_close
+            last = len(self.entries) - 1
+            if last >= 0 and last not in self.updates:
+                # HCL needs a comma between the last existing entry and ours
+                last_end = self.entries[last][1]
+                if not text[last_end:close].lstrip().startswith(","):
+                    out.append(text[pos:last_end] + ",")
+                    pos = last_end
+            insert_at = _line_start(text, close)
+            out.append(text[pos:insert_at])
+            if text[insert_at - 1:insert_at] != "\n":
+                out.append("\n")
+            out.append("\n".join(block for _, _, block in self.inserts) + "\n")
+            pos = insert_at
+        out.append(text[pos:])
+        return "".join(out)
+
+    def commit(self):
+        """Write every queued change in one atomic rename.
+
+        Returns:
+            bool: whether the file changed
+
+        Raises:
+            TfvarsError: the file was modified since it was read
+        """
+        if not self.inserts and not self.updates:
+            return False
+        content = self.render()
+        try:
+            with open(self.path, "r") as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != self.original:
+            raise TfvarsError(f"{self.path} changed while importing; re-run to pick it up")
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        if self.original is not None:
+            _write_atomic(self.path + ".backup", self.original, directory)
+        _write_atomic(self.path, content, directory)
+        self.original = self.text = content
+        return True
+
+
+def _write_atomic(path, content, directory, durable=True):
+    """Write ``content`` to a temp file in ``directory`` and rename it over ``path``.
+
+    ``durable=False`` skips the fsync: readers still never see a torn file,
+    but a crash may lose the write, which is fine for cache entries.
+    """
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
 
 
 # ---------------------------------------------------------------------------
-# File manipulation
+# Import commands
 # ---------------------------------------------------------------------------
 
-def append_to_tfvars(filepath, content):
-    """Append a new instance block before the closing ']' of the list variable."""
+IMPORTS_FILE = "imports.tf"
+IMPORTS_HEADER = (
+    "# Generated by terraform/scripts/import_proxmox.py --import-blocks.\n"
+    "# Applied with the next plan/apply; delete this file once that apply succeeded.\n"
+)
+_IMPORT_TO_RE = re.compile(r"^\s*to\s*=\s*(\S+)\s*$", re.M)
+
+
+def resource_address(kind, hostname):
+    """State address of one guest, e.g. module.lxc[0]....container["dns-1"]."""
+    rc = RESOURCE_CONFIG[kind]
+    return f'{rc["module_path"]}.{rc["bpg_resource"]}["{hostname}"]'
+
+
+def import_command(kind, hostname, node, vmid):
+    """Build the `terraform import` command for one guest."""
+    var_file_args = " ".join(RESOURCE_CONFIG[kind]["var_files"])
+    return f"terraform import {var_file_args} '{resource_address(kind, hostname)}' {node}/{vmid}"
+
+
+def import_block(kind, hostname, node, vmid):
+    """Build a declarative `import {}` block for one guest (Terraform/OpenTofu >= 1.5)."""
+    return "\n".join([
+        "import {",
+        f"  to = {resource_address(kind, hostname)}",
+        f'  id = "{node}/{vmid}"',
+        "}",
+    ])
+
+
+def write_import_blocks(kind, guests):
+    """Add import blocks for ``guests`` to the project's imports.tf.
+
+    Blocks already in the file (from an earlier batch that has not been
+    applied yet) are kept; guests whose address is already there are not
+    added twice. The file is rewritten atomically.
+
+    Args:
+        kind: RESOURCE_CONFIG key
+        guests: (hostname, node, vmid) tuples
+
+    Returns:
+        tuple: (path, number of blocks added)
+    """
+    path = os.path.join(RESOURCE_CONFIG[kind]["tf_dir"], IMPORTS_FILE)
     try:
-        with open(filepath, "r") as f:
-            lines = f.readlines()
+        with open(path, "r") as f:
+            current = f.read()
     except FileNotFoundError:
-        sys.stderr.write(f"File not found: {filepath}\n")
-        return False
+        current = IMPORTS_HEADER
+    present = set(_IMPORT_TO_RE.findall(current))
+    blocks = []
+    for hostname, node, vmid in guests:
+        if resource_address(kind, hostname) in present:
+            continue
+        present.add(resource_address(kind, hostname))
+        blocks.append(import_block(kind, hostname, node, vmid))
+    if blocks:
+        content = current.rstrip("\n") + "\n\n" + "\n\n".join(blocks) + "\n"
+        _write_atomic(path, content, os.path.dirname(os.path.abspath(path)))
+    return path, len(blocks)
 
-    # Find last ']'
-    bracket_idx = -1
-    for i in range(len(lines) - 1, -1, -1):
-        if "]" in lines[i]:
-            bracket_idx = i
-            break
 
-    if bracket_idx == -1:
-        sys.stderr.write(f"Could not find closing ']' in {filepath}\n")
-        return False
+def print_import_blocks(kind, guests, dry_run):
+    """Write (or, for a dry run, print) import blocks and how to apply them."""
+    rc = RESOURCE_CONFIG[kind]
+    var_file_args = " ".join(rc["var_files"])
+    if dry_run:
+        print(f"\n=== IMPORT BLOCKS ({kind}: {IMPORTS_FILE}) ===")
+        print("\n\n".join(import_block(kind, *g) for g in guests))
+    else:
+        path, added = write_import_blocks(kind, guests)
+        print(f"\n=== IMPORT BLOCKS ({kind}) ===")
+        print(f"Added {added} import block(s) to {path}")
+    print(f"cd {rc['tf_dir']}")
+    print(f"terraform plan {var_file_args}   # shows every import, one refresh")
+    print(f"terraform apply {var_file_args}")
+    print(f"rm {IMPORTS_FILE}   # once the apply succeeded")
+
+
+GENERATORS = {
+    "lxc": generate_lxc_hcl,
+    "talos-vm": generate_talos_vm_hcl,
+}
 
-    # Expand single-line empty list: 'var = []' → 'var = [\n]\n'
-    if "[]" in lines[bracket_idx]:
-        parts = lines[bracket_idx].split("[]")
-        lines[bracket_idx] = parts[0] + "[\n"
-        lines.insert(bracket_idx + 1, "]\n")
-        bracket_idx += 1
+FIELDS = {
+    "lxc": lxc_fields,
+    "talos-vm": talos_vm_fields,
+}
 
-    # Ensure trailing comma on previous item
-    if bracket_idx > 0:
-        prev = lines[bracket_idx - 1].strip()
-        if prev and not prev.endswith(",") and not prev.endswith("["):
-            lines[bracket_idx - 1] = lines[bracket_idx - 1].rstrip() + ",\n"
 
-    lines.insert(bracket_idx, content + "\n")
+# ---------------------------------------------------------------------------
+# Terraform state
+# ---------------------------------------------------------------------------
 
-    with open(filepath, "w") as f:
-        f.writelines(lines)
+def managed_guests():
+    """Every guest already in the state of a project under TF_ROOT.
 
-    return True
+    Runs the inventory script's --managed query, which pulls each project's
+    state with `terragrunt state pull` and keeps the result in the same
+    per-project cache entries the inventory uses. INVENTORY_CACHE=1 is set
+    unless the caller chose otherwise, so an entry pulled within
+    INVENTORY_CACHE_TTL seconds (by either tool) costs no pull at all.
+    The script's own warnings (failed pulls, stale entries) go to stderr.
+
+    Returns:
+        dict: vmid → {"address", "node", "project"}; empty when state could
+        not be read, in which case only instances tfvars guard against
+        duplicates
+    """
+    env = dict(os.environ, INVENTORY_TF_ROOT=TF_ROOT)
+    env.setdefault("INVENTORY_CACHE", "1")
+    try:
+        proc = subprocess.run(
+            [sys.executable, INVENTORY_SCRIPT, "--managed"],
+            env=env,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        result = json.loads(proc.stdout) if proc.returncode == 0 else None
+    except (OSError, ValueError):
+        result = None
+    if result is None:
+        sys.stderr.write("Warning: could not read Terraform state; checking instances tfvars only\n")
+        return {}
+    for path in result["unavailable"]:
+        sys.stderr.write(f"Warning: no Terraform state for {path}; checking its tfvars only\n")
+    return {int(vmid): entry for vmid, entry in result["guests"].items()}
+
+
+# ---------------------------------------------------------------------------
+# Bulk import
+# ---------------------------------------------------------------------------
+
+def select_guests(resources, kinds, node=None, tags=(), vmid_range=None):
+    """Filter /cluster/resources entries down to importable guests.
+
+    Templates and guest kinds without a RESOURCE_CONFIG entry are dropped.
+    Every --tag given must be present on the guest.
+
+    Returns:
+        list: (kind, node, vmid, name) tuples sorted by VMID
+    """
+    wanted = set(tags)
+    selected = []
+    for res in resources:
+        kind = API_TYPES.get(res.get("type"))
+        if kind not in kinds or res.get("template"):
+            continue
+        vmid = int(res["vmid"])
+        if node and res.get("node") != node:
+            continue
+        if vmid_range and not vmid_range[0] <= vmid <= vmid_range[1]:
+            continue
+        if wanted and not wanted <= set(parse_tags(res)):
+            continue
+        selected.append((kind, res["node"], vmid, res.get("name", "")))
+    return sorted(selected, key=lambda g: g[2])
+
+
+class ImportBatchError(Exception):
+    """A batch that could not be written: an unusable tfvars file or a failed write."""
+
+
+def bulk_import(args, client, cache=None):
+    """Discover, filter, fetch and render every matching guest in one pass."""
+    kinds = [args.type] if args.type else list(RESOURCE_CONFIG)
+
+    managed = {}
+    if not args.no_state:
+        print("Reading Terraform state...")
+        managed = managed_guests()
+
+    print("Listing cluster guests...")
+    try:
+        resources = list_guests(client)
+    except ProxmoxAPIError as e:
+        sys.stderr.write(f"Could not list cluster resources: {e}\n")
+        sys.exit(1)
+
+    guests = select_guests(resources, kinds, args.node, args.tag or (), args.vmid_range)
+    signatures = {int(res["vmid"]): resource_signature(res) for res in resources}
+    try:
+        failures = import_guests(args, client, cache, kinds, guests, managed, signatures)
+    except ImportBatchError as e:
+        sys.stderr.write(f"{e}\n")
+        sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+
+def import_guests(args, client, cache, kinds, guests, managed, signatures=None):
+    """Import one batch of guests into the instances tfvars of ``kinds``.
+
+    Guests already in a tfvars file or in ``managed`` (see managed_guests())
+    are skipped; the rest are fetched concurrently, rendered, written with
+    one TfvarsFile commit per kind and followed by their import commands or
+    blocks. Guests whose config turns out to be a template are skipped too.
+
+    Args:
+        guests: (kind, node, vmid, name) tuples; name may be '' if unknown
+        managed: vmid → Terraform state entry of already managed guests
+        signatures: vmid → resource_signature(), for the config cache
+
+    Returns:
+        list: ((kind, node, vmid, name), error) for every failed guest,
+        already reported on stderr
+
+    Raises:
+        ImportBatchError: a tfvars file could not be loaded, or the tfvars
+            or imports.tf write failed (kinds written before it stay written)
+    """
+    writers, known = {}, {}
+    for kind in kinds:
+        rc = RESOURCE_CONFIG[kind]
+        tfvars_path = os.path.join(rc["tf_dir"], rc["tfvars_file"])
+        try:
+            writers[kind] = TfvarsFile(tfvars_path, rc["tfvars_variable"])
+        except TfvarsError as e:
+            raise ImportBatchError(str(e)) from e
+        # Entries of the target file are handled by its writer (--update can
+        # refresh them); entries in other tfvars files are always skipped.
+        known[kind] = existing_instances(kind, exclude=[tfvars_path])
+        if not args.update:
+            known[kind][0].update(writers[kind].by_vmid)
+            known[kind][1].update(writers[kind].by_hostname)
+
+    pending = []
+    for guest in guests:
+        kind, _, vmid, name = guest
+        vmids, hostnames = known[kind]
+        if vmid in vmids or name in hostnames:
+            print(f"Skipping {name or vmid} (VMID {vmid}): already in {kind} tfvars")
+            continue
+        # --update still refreshes the tfvars entry of a managed guest.
+        state = managed.get(vmid)
+        if state and not (args.update and vmid in writers[kind].by_vmid):
+            print(f"Skipping {name or vmid} (VMID {vmid}): already in Terraform state as {state['address']}")
+            continue
+        pending.append(guest)
+
+    print(f"{len(guests)} matching guest(s), {len(pending)} to import")
+    if not pending:
+        return []
+
+    blocks = {kind: [] for kind in kinds}
+    imports = {kind: [] for kind in kinds}
+    updated = {kind: 0 for kind in kinds}
+    failures = []
+    results = fetch_configs(client, pending, args.workers, cache, signatures)
+    stats = client.stats
+    print(
+        f"Loaded {len(pending)} config(s): {stats['requests']} API request(s) over "
+        f"{stats['connections']} connection(s), {stats['retries']} retried"
+    )
+    if cache is not None:
+        print(
+            f"Config cache: {cache.stats['hits']} reused, {cache.stats['fetched']} fetched, "
+            f"{cache.stats['changed']} changed since cached (by digest)"
+        )
+    for guest, config, error in results:
+        kind, node, vmid, _ = guest
+        if error:
+            failures.append((guest, error))
+            continue
+        if config.get("template"):
+            print(f"Skipping VMID {vmid}: template")
+            continue
+        hostname = guest_hostname(kind, config, vmid)
+        if hostname in known[kind][1]:
+            failures.append((guest, f"hostname {hostname!r} already used in another tfvars file"))
+            continue
+        block = GENERATORS[kind](config, vmid, hostname)
+        try:
+            action = writers[kind].add(vmid, hostname, block, replace=args.update)
+        except TfvarsError as e:
+            failures.append((guest, str(e)))
+            continue
+        blocks[kind].append(block)
+        if action == "update":
+            updated[kind] += 1
+            print(f"Found: {hostname} (VMID {vmid} on {node}), updating existing entry")
+            continue
+        imports[kind].append((hostname, node, vmid))
+        print(f"Found: {hostname} (VMID {vmid} on {node})")
+
+    for kind in kinds:
+        if not blocks[kind]:
+            continue
+        rc = RESOURCE_CONFIG[kind]
+        writer = writers[kind]
+        if args.dry_run:
+            print(f"\n=== GENERATED TFVARS BLOCKS ({rc['tfvars_file']}) ===")
+            print("\n".join(blocks[kind]))
+        else:
+            print(
+                f"\nWriting {len(blocks[kind]) - updated[kind]} new and "
+                f"{updated[kind]} updated block(s) to {writer.path}..."
+            )
+            try:
+                writer.commit()
+            except (TfvarsError, OSError) as e:
+                raise ImportBatchError(f"Failed to write configuration: {e}") from e
+        if not imports[kind]:
+            continue
+        if args.import_blocks:
+            try:
+                print_import_blocks(kind, imports[kind], args.dry_run)
+            except OSError as e:
+                raise ImportBatchError(f"Failed to write {IMPORTS_FILE}: {e}") from e
+            continue
+        print(f"\n=== IMPORT COMMANDS ({kind}) ===")
+        print(f"cd {rc['tf_dir']}")
+        print("\n".join(import_command(kind, *g) for g in imports[kind]))
+        print("terraform plan " + " ".join(rc["var_files"]))
+
+    if failures:
+        sys.stderr.write(f"\n{len(failures)} guest(s) failed:\n")
+        for (kind, node, vmid, name), error in failures:
+            sys.stderr.write(f"  {name or '?'} ({kind} {node}/{vmid}): {error}\n")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# Drift scan
+# ---------------------------------------------------------------------------
+
+# Attributes compared per kind: what *_fields() derive from the live config,
+# minus start (power state, not config) and values the generators hardcode
+DRIFT_FIELDS = {
+    "lxc": ("hostname", "ip", "gw", "mac", "cores", "memory", "swap", "disk_size", "onboot", "tag", "tags"),
+    "talos-vm": ("hostname", "ip", "gw", "mac", "cores", "memory", "disk_size", "onboot", "tag", "tags"),
+}
+# Schema defaults of optional attributes an entry may leave out
+DRIFT_DEFAULTS = {"tag": 0}
+# Attributes a live config may not carry at all (Talos has no cloud-init)
+UNDERIVABLE = {"talos-vm": ("ip", "gw")}
+
+# Exit status when drift or missing guests were found (like plan -detailed-exitcode)
+DRIFT_EXIT = 2
+
+
+def _drift_value(field, value):
+    if value in ("", None):
+        return DRIFT_DEFAULTS.get(field)
+    if field == "tags":
+        return sorted(value)
+    if field == "mac":
+        return value.upper()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def compare_entry(kind, entry, live, node):
+    """Field-by-field differences between a tfvars entry and live fields.
+
+    Args:
+        kind: RESOURCE_CONFIG key
+        entry: Attributes parsed from the tfvars entry
+        live: *_fields() of the live config
+        node: Node the guest runs on
+
+    Returns:
+        dict: field → {"tfvars": value, "live": value}; empty when in sync
+    """
+    diffs = {}
+    for field in DRIFT_FIELDS[kind]:
+        if field not in entry and field not in DRIFT_DEFAULTS:
+            continue
+        want = _drift_value(field, entry.get(field))
+        have = _drift_value(field, live.get(field))
+        if field == "mac" and want is None:
+            continue  # no MAC pinned: Proxmox assigns one
+        if have is None and field in UNDERIVABLE.get(kind, ()):
+            continue
+        if want != have:
+            diffs[field] = {"tfvars": want, "live": have}
+    target = entry.get("target_node")
+    if target and target != node:
+        diffs["target_node"] = {"tfvars": target, "live": node}
+    return diffs
+
+
+def drift_scan(args, client, cache=None):
+    """Compare every tfvars entry with its live config and report drift.
+
+    Returns:
+        int: exit status (0 in sync, DRIFT_EXIT on drift/missing, 1 on errors)
+    """
+    started = time.monotonic()
+    kinds = [args.type] if args.type else list(RESOURCE_CONFIG)
+    filtered = bool(args.node or args.tag)
+
+    try:
+        resources = list_guests(client)
+    except ProxmoxAPIError as e:
+        sys.stderr.write(f"Could not list cluster resources: {e}\n")
+        return 1
+    live = {vmid: (kind, node, name) for kind, node, vmid, name in select_guests(resources, kinds)}
+    selected = {g[2] for g in select_guests(resources, kinds, args.node, args.tag or (), args.vmid_range)}
+
+    rows, managed, guests = [], set(), []
+    for kind in kinds:
+        rc = RESOURCE_CONFIG[kind]
+        path = os.path.join(rc["tf_dir"], rc["tfvars_file"])
+        if not os.path.exists(path):
+            continue
+        try:
+            entries = list(TfvarsFile(path, rc["tfvars_variable"]).values())
+        except TfvarsError as e:
+            sys.stderr.write(f"{e}\n")
+            return 1
+        for entry in entries:
+            vmid, hostname = entry.get("vmid"), entry.get("hostname")
+            if vmid is None:
+                continue
+            managed.add(vmid)
+            if args.vmid_range and not args.vmid_range[0] <= vmid <= args.vmid_range[1]:
+                continue
+            if vmid not in live or live[vmid][0] != kind:
+                if not filtered:
+                    rows.append({"kind": kind, "hostname": hostname, "vmid": vmid,
+                                 "node": None, "status": "missing"})
+                continue
+            if vmid not in selected:
+                continue
+            guests.append((kind, live[vmid][1], vmid, hostname))
+            rows.append({"kind": kind, "hostname": hostname, "vmid": vmid,
+                         "node": live[vmid][1], "entry": entry})
+
+    signatures = {int(res["vmid"]): resource_signature(res) for res in resources}
+    results = {g[2]: (config, error) for g, config, error in
+               fetch_configs(client, guests, args.workers, cache, signatures)} if guests else {}
+    for row in rows:
+        if "entry" not in row:
+            continue
+        entry = row.pop("entry")
+        config, error = results[row["vmid"]]
+        if error:
+            row.update(status="error", error=error)
+            continue
+        kind = row["kind"]
+        fields = FIELDS[kind](config, row["vmid"], guest_hostname(kind, config, row["vmid"]))
+        diffs = compare_entry(kind, entry, fields, row["node"])
+        row.update(status="drift" if diffs else "ok", fields=diffs)
+
+    for vmid in sorted(selected - managed):
+        kind, node, name = live[vmid]
+        rows.append({"kind": kind, "hostname": name, "vmid": vmid, "node": node, "status": "unmanaged"})
+
+    rows.sort(key=lambda r: (r["kind"], r["vmid"]))
+    summary = {"managed": len(guests) + sum(r["status"] == "missing" for r in rows)}
+    for status in ("ok", "drift", "missing", "unmanaged", "error"):
+        summary[status] = sum(r["status"] == status for r in rows)
+    summary["seconds"] = round(time.monotonic() - started, 2)
+
+    if args.format == "json":
+        json.dump({"summary": summary, "hosts": rows}, sys.stdout, indent=2)
+        print()
+    else:
+        print_drift_report(summary, rows)
+
+    if summary["error"]:
+        return 1
+    return DRIFT_EXIT if summary["drift"] or summary["missing"] else 0
+
+
+def print_drift_report(summary, rows):
+    """Human-readable drift report: one line per host, one per drifted field."""
+    print(
+        f"Drift scan: {summary['managed']} managed guest(s), {summary['drift']} drifted, "
+        f"{summary['missing']} missing, {summary['unmanaged']} unmanaged, "
+        f"{summary['error']} failed ({summary['seconds']}s)"
+    )
+    for row in rows:
+        if row["status"] == "ok":
+            continue
+        where = f"{row['kind']} {row['vmid']}" + (f" on {row['node']}" if row["node"] else "")
+        label = row["status"].upper()
+        if row["status"] == "missing":
+            print(f"  {label:<10} {row['hostname']} ({where}): in tfvars but not on the cluster")
+        elif row["status"] == "unmanaged":
+            print(f"  {label:<10} {row['hostname']} ({where}): on the cluster but not in tfvars")
+        elif row["status"] == "error":
+            print(f"  {label:<10} {row['hostname']} ({where}): {row['error']}")
+        else:
+            print(f"  {label:<10} {row['hostname']} ({where})")
+            for field, diff in row["fields"].items():
+                print(f"             {field:<12} tfvars {json.dumps(diff['tfvars'])}  live {json.dumps(diff['live'])}")
+
+
+# ---------------------------------------------------------------------------
+# Watch mode
+# ---------------------------------------------------------------------------
+
+# Finished Proxmox tasks that leave behind a guest to adopt
+WATCH_TASKS = {
+    "vzcreate": "lxc",
+    "vzrestore": "lxc",
+    "vzclone": "lxc",
+    "qmcreate": "talos-vm",
+    "qmrestore": "talos-vm",
+    "qmclone": "talos-vm",
+}
+DEFAULT_WATCH_INTERVAL = 30
+# Tasks are told apart by UPID this many seconds back from the cursor, so one
+# that shows up in /cluster/tasks late (or comes from a node whose clock lags)
+# is still handled, and handled once.
+CURSOR_WINDOW = 300
+# Polls a task whose guest failed to import (or whose clone log could not be
+# read) is retried on before the watch gives up on it
+WATCH_RETRIES = 10
+_CLONE_DISK_RE = re.compile(r"\b(?:vm|subvol)-(\d+)-disk-\d+")
+
+
+def cursor_path(args, client):
+    """--cursor, or a file under $XDG_STATE_HOME/proxmox-import.
+
+    A watch moves its cursor past tasks its --type and --node filters leave
+    out, so each endpoint and filter combination gets a cursor of its own.
+    """
+    if args.cursor:
+        return args.cursor
+    base = os.path.join(
+        os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"), "proxmox-import"
+    )
+    name = "-".join([_endpoint_key(client)] + [v for v in (args.type, args.node) if v])
+    return os.path.join(base, f"{name}.cursor")
+
+
+def load_cursor(path):
+    """Read the persisted task cursor.
+
+    Returns:
+        dict: {"endtime": newest task end handled, "upids": {upid: endtime}
+        for the tasks handled within CURSOR_WINDOW of it, "retry": {upid:
+        {"task", "attempts"}} for tasks to try again}; None before the
+        first poll
+    """
+    try:
+        with open(path, "r") as f:
+            cursor = json.load(f)
+        return {
+            "endtime": int(cursor["endtime"]),
+            "upids": dict(cursor["upids"]),
+            "retry": dict(cursor.get("retry") or {}),
+        }
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        sys.stderr.write(f"Ignoring unreadable cursor {path}: {e}\n")
+        return None
+
+
+def save_cursor(path, cursor):
+    """Persist ``cursor``; a failed write is only reported (the next save rewrites it all)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(path, json.dumps(cursor, sort_keys=True) + "\n", directory)
+    except OSError as e:
+        sys.stderr.write(f"Could not save cursor {path}: {e}\n")
+
+
+def new_tasks(tasks, cursor):
+    """Finished tasks the cursor has not seen, oldest first."""
+    since = cursor["endtime"] - CURSOR_WINDOW
+    fresh = [
+        t for t in tasks
+        if t.get("endtime") and t["endtime"] >= since and t["upid"] not in cursor["upids"]
+    ]
+    return sorted(fresh, key=lambda t: (t["endtime"], t["upid"]))
+
+
+def advance_cursor(cursor, tasks, failed=()):
+    """Cursor after handling ``tasks``: the newest end time plus the UPIDs still in the window.
+
+    Tasks in ``failed`` are kept whole in the retry set, so they are tried
+    again even once they have left the window or /cluster/tasks, until
+    WATCH_RETRIES attempts have failed.
+    """
+    endtime = max([cursor["endtime"]] + [t["endtime"] for t in tasks])
+    upids = dict(cursor["upids"])
+    upids.update((t["upid"], t["endtime"]) for t in tasks)
+    retry = {}
+    for task in failed:
+        attempts = cursor.get("retry", {}).get(task["upid"], {}).get("attempts", 0) + 1
+        if attempts >= WATCH_RETRIES:
+            sys.stderr.write(
+                f"Giving up on {task['upid']} after {attempts} attempts; import it with --vmid\n"
+            )
+            continue
+        retry[task["upid"]] = {"task": task, "attempts": attempts}
+    return {
+        "endtime": endtime,
+        "upids": {u: e for u, e in upids.items() if e >= endtime - CURSOR_WINDOW},
+        "retry": retry,
+    }
+
+
+def clone_target(client, task):
+    """VMID a finished vzclone/qmclone task created.
+
+    The task's own id is the source guest; the new one only shows up in the
+    names of the volumes the clone created (vm-<vmid>-disk-N), so this
+    reads the task log.
+
+    Returns:
+        int: The new VMID, or None unless the log names exactly one
+    """
+    upid = urllib.parse.quote(task["upid"], safe="")
+    lines = client.get(f"nodes/{task['node']}/tasks/{upid}/log?limit=1000", node=task["node"])
+    vmids = {int(v) for line in lines or [] for v in _CLONE_DISK_RE.findall(line.get("t", ""))}
+    vmids.discard(int(task["id"]))
+    return vmids.pop() if len(vmids) == 1 else None
+
+
+def task_guests(client, tasks, kinds, node=None, vmid_range=None):
+    """The guests successful WATCH_TASKS among ``tasks`` left behind.
+
+    Returns:
+        tuple: ({vmid: ((kind, node, vmid, ''), [tasks naming it])}, clone
+        tasks whose log could not be read and are worth retrying)
+    """
+    guests, unresolved = {}, []
+    for task in tasks:
+        kind = WATCH_TASKS.get(task.get("type"))
+        if kind not in kinds or task.get("status") != "OK":
+            continue
+        if node and task["node"] != node:
+            continue
+        if task["type"].endswith("clone"):
+            try:
+                vmid = clone_target(client, task)
+            except ProxmoxAPIError as e:
+                sys.stderr.write(f"Could not read the log of {task['upid']}: {e}\n")
+                unresolved.append(task)
+                continue
+            if vmid is None:
+                sys.stderr.write(
+                    f"Could not tell which guest {task['upid']} created; import it with --vmid\n"
+                )
+                continue
+        else:
+            vmid = int(task["id"])
+        if vmid_range and not vmid_range[0] <= vmid <= vmid_range[1]:
+            continue
+        print(f"Task {task['type']} on {task['node']}: VMID {vmid}")
+        named = guests[vmid][1] if vmid in guests else []
+        guests[vmid] = ((kind, task["node"], vmid, ""), named + [task])
+    return guests, unresolved
+
+
+def watch(args, client, cache=None):
+    """Follow /cluster/tasks and import the guests new tasks leave behind.
+
+    Each poll is one /cluster/tasks request, whatever the size of the
+    cluster; only guests named by new create, restore and clone tasks are
+    fetched, and they go through the same batch import as --all. The cursor
+    is saved after every poll that saw new tasks (not with --dry-run), so a
+    restart picks up where the last run stopped. The first poll without a
+    cursor only records where the task list ends. Tasks whose guest failed
+    to import are retried on later polls (see advance_cursor()). A batch that can't be
+    written (ImportBatchError) is reported and leaves the cursor alone, so
+    the next poll tries it again; only Ctrl-C ends the watch.
+
+    Returns:
+        int: Exit code; with --once, 1 if a guest of that poll failed
+    """
+    kinds = [args.type] if args.type else list(RESOURCE_CONFIG)
+    path = cursor_path(args, client)
+    cursor = load_cursor(path)
+    # A restore replaces a config the cache may still hold from before.
+    if cache is not None:
+        cache.ttl = 0
+    print(f"Watching cluster tasks every {args.interval:g}s (cursor: {path})")
+    try:
+        while True:
+            failures, failed = [], []
+            try:
+                tasks = client.get("cluster/tasks") or []
+            except ProxmoxAPIError as e:
+                sys.stderr.write(f"Could not list cluster tasks: {e}\n")
+                tasks = None
+            finished = [t for t in tasks or [] if t.get("endtime") and t.get("upid")]
+            if tasks is not None and cursor is None:
+                cursor = advance_cursor({"endtime": 0, "upids": {}, "retry": {}}, finished)
+                print(
+                    f"Starting after the {len(finished)} task(s) already in the cluster log; "
+                    "adopt guests created before now with --all"
+                )
+                if not args.dry_run:
+                    save_cursor(path, cursor)
+            elif tasks is not None:
+                if cursor["endtime"] and finished and min(t["endtime"] for t in finished) > cursor["endtime"]:
+                    sys.stderr.write(
+                        "Warning: every task in the cluster log is newer than the cursor; tasks "
+                        "may have rotated out while nothing was watching (catch up with --all)\n"
+                    )
+                fresh = new_tasks(finished, cursor)
+                work = fresh + [r["task"] for r in cursor["retry"].values()]
+                found, failed = task_guests(client, work, kinds, args.node, args.vmid_range)
+                if found:
+                    managed = {} if args.no_state else managed_guests()
+                    guests = [found[vmid][0] for vmid in sorted(found)]
+                    try:
+                        failures = import_guests(args, client, cache, kinds, guests, managed)
+                    except ImportBatchError as e:
+                        # Nothing is marked handled: the next poll tries the batch again.
+                        sys.stderr.write(f"{e}; retrying on the next poll\n")
+                        failures, work = [e], []
+                    else:
+                        failed += [t for (_, _, vmid, _), _ in failures for t in found[vmid][1]]
+                if work:
+                    cursor = advance_cursor(cursor, work, failed)
+                    if not args.dry_run:
+                        save_cursor(path, cursor)
+            if args.once:
+                return 1 if failures or failed or tasks is None else 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
 
 
 # ---------------------------------------------------------------------------
@@ -318,17 +1885,127 @@ def main():
     parser = argparse.ArgumentParser(
         description="Import existing Proxmox resources into Terraform (bpg/proxmox provider)"
     )
-    parser.add_argument("--vmid", required=True, type=int, help="VMID to import")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--vmid", type=int, help="VMID to import")
+    target.add_argument(
+        "--all",
+        action="store_true",
+        help="Bulk mode: import every guest matching the filters below",
+    )
+    target.add_argument(
+        "--drift",
+        action="store_true",
+        help="Compare live configs of the guests matching the filters below with "
+        f"instances tfvars; exits {DRIFT_EXIT} on drift",
+    )
+    target.add_argument(
+        "--watch",
+        action="store_true",
+        help="Follow /cluster/tasks and import the guests that create, restore and "
+        "clone tasks leave behind (--type, --node and --vmid-range narrow it)",
+    )
     parser.add_argument(
         "--type",
-        choices=["lxc", "talos-vm"],
-        default="lxc",
-        help="Resource type (default: lxc)",
+        choices=list(RESOURCE_CONFIG),
+        help="Resource type (default: lxc; bulk mode: all types)",
+    )
+    parser.add_argument(
+        "--node",
+        help="Proxmox node name (default: pve; bulk/drift mode: filter, default all nodes)",
+    )
+    parser.add_argument(
+        "--tag",
+        action="append",
+        help="Bulk/drift mode: only guests carrying this Proxmox tag (repeatable, all must match)",
+    )
+    parser.add_argument(
+        "--vmid-range",
+        type=parse_vmid_range,
+        metavar="LO-HI",
+        help="Bulk/drift mode: only VMIDs in this inclusive range",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Concurrent API requests cluster-wide (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--per-node",
+        type=int,
+        default=DEFAULT_PER_NODE,
+        help=f"Concurrent API requests per Proxmox node (default: {DEFAULT_PER_NODE})",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"API socket timeout in seconds (default: {DEFAULT_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=f"Retries on timeouts, 429 and 5xx responses (default: {DEFAULT_RETRIES})",
     )
-    parser.add_argument("--node", default="pve", help="Proxmox node name (default: pve)")
     parser.add_argument("--api-url", required=True, help="Proxmox API URL")
     parser.add_argument("--api-token-id", required=True, help="API token ID (user@realm!token)")
     parser.add_argument("--api-token-secret", required=True, help="API token secret")
+    parser.add_argument(
+        "--format",
+        choices=["text", "json"],
+        default="text",
+        help="Drift report format (default: text)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Guest config cache directory (default: $XDG_CACHE_HOME/proxmox-import)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        help="Seconds a cached guest config is reused by --dry-run; bulk mode also requires "
+        "the guest's /cluster/resources entry to be unchanged. Writing runs always refetch "
+        f"(default: {DEFAULT_CACHE_TTL})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always fetch guest configs from the API",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+        help=f"Watch mode: seconds between /cluster/tasks polls (default: {DEFAULT_WATCH_INTERVAL})",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Watch mode: poll once and exit (e.g. from cron or a systemd timer)",
+    )
+    parser.add_argument(
+        "--cursor",
+        help="Watch mode: task cursor file (default: one per endpoint, --type and --node "
+        "under $XDG_STATE_HOME/proxmox-import)",
+    )
+    parser.add_argument(
+        "--no-state",
+        action="store_true",
+        help="Don't skip guests that are already in Terraform state (saves the state pull)",
+    )
+    parser.add_argument(
+        "--import-blocks",
+        action="store_true",
+        help=f"Write declarative import {{}} blocks to the project's {IMPORTS_FILE} "
+        "instead of printing `terraform import` commands",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Replace the tfvars entry of a VMID that is already defined instead of rejecting it",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -336,62 +2013,97 @@ def main():
     )
 
     args = parser.parse_args()
+    client = client_from_args(args)
+    cache = cache_from_args(args, client)
+    try:
+        # Only a --dry-run preview may be served from the cache. Anything that
+        # writes tfvars or imports.tf reads live configs (still refreshing the
+        # cache and its digest counts): the resource signature misses edits
+        # such as an IP, MAC or onboot change. Drift always reads live too; a
+        # cached copy would hide exactly the hand edits it looks for.
+        if cache is not None and (args.drift or not args.dry_run):
+            cache.ttl = 0
+        if args.drift:
+            sys.exit(drift_scan(args, client, cache))
+        if args.watch:
+            sys.exit(watch(args, client, cache))
+        if args.all:
+            bulk_import(args, client, cache)
+        else:
+            import_one(args, client, cache)
+    finally:
+        if cache is not None:
+            with contextlib.suppress(OSError):
+                cache.prune()
+
+
+def import_one(args, client, cache=None):
+    """Single-VMID import: fetch, render, write and print instructions."""
+    args.type = args.type or "lxc"
+    args.node = args.node or "pve"
     rc = RESOURCE_CONFIG[args.type]
 
+    if not args.no_state and not args.update:
+        state = managed_guests().get(args.vmid)
+        if state:
+            sys.stderr.write(
+                f"VMID {args.vmid} is already in Terraform state as {state['address']}; "
+                "use --update to refresh its tfvars entry\n"
+            )
+            sys.exit(1)
+
     print(f"Fetching config for VMID {args.vmid} ({args.type}) from node {args.node}...")
 
-    config = fetch_config(
-        args.api_url,
-        args.api_token_id,
-        args.api_token_secret,
-        args.node,
-        args.vmid,
-        rc["proxmox_api_type"],
-    )
+    config = fetch_config(client, args.node, args.vmid, rc["proxmox_api_type"], cache)
 
     if not config:
         print(f"No configuration found for VMID {args.vmid}")
         sys.exit(1)
 
-    # Determine hostname
-    if args.type == "lxc":
-        hostname = config.get("hostname", f"ct-{args.vmid}")
-    else:
-        hostname = config.get("name", f"vm-{args.vmid}")
+    hostname = guest_hostname(args.type, config, args.vmid)
 
     print(f"Found: {hostname} (VMID {args.vmid})")
 
     # Generate HCL
-    generators = {
-        "lxc": generate_lxc_hcl,
-        "talos-vm": generate_talos_vm_hcl,
-    }
-    hcl = generators[args.type](config, args.vmid, hostname)
+    hcl = GENERATORS[args.type](config, args.vmid, hostname)
 
     # Build import command
-    resource_addr = f'{rc["module_path"]}.{rc["bpg_resource"]}["{hostname}"]'
-    import_id = f"{args.node}/{args.vmid}"
     var_file_args = " ".join(rc["var_files"])
-    import_cmd = f"terraform import {var_file_args} '{resource_addr}' {import_id}"
+    import_cmd = import_command(args.type, hostname, args.node, args.vmid)
 
     # Build target file path
     tfvars_path = os.path.join(rc["tf_dir"], rc["tfvars_file"])
 
+    try:
+        writer = TfvarsFile(tfvars_path, rc["tfvars_variable"])
+        action = writer.add(args.vmid, hostname, hcl, replace=args.update)
+    except TfvarsError as e:
+        sys.stderr.write(f"{e}\n")
+        sys.exit(1)
+
     if args.dry_run:
         print("\n=== GENERATED TFVARS BLOCK ===")
         print(hcl)
+        if args.import_blocks:
+            print_import_blocks(args.type, [(hostname, args.node, args.vmid)], True)
+            return
         print(f"\n=== IMPORT COMMAND ===")
         print(f"cd {rc['tf_dir']}")
         print(import_cmd)
         print("terraform plan " + var_file_args)
         return
 
-    # Append to tfvars
-    print(f"\nAppending to {tfvars_path}...")
-    if not append_to_tfvars(tfvars_path, hcl):
-        print("Failed to append configuration.")
+    # Write tfvars
+    verb = "Updating entry in" if action == "update" else "Appending to"
+    print(f"\n{verb} {tfvars_path}...")
+    try:
+        writer.commit()
+    except (TfvarsError, OSError) as e:
+        sys.stderr.write(f"Failed to write configuration: {e}\n")
         sys.exit(1)
     print("Done.")
+    if action == "update":
+        return
 
     # Print import instructions
     print(f"\n{'=' * 60}")
@@ -401,6 +2113,19 @@ def main():
     if args.type == "talos-vm":
         print("   - Set talos_role to 'controlplane' or 'worker' as appropriate")
         print("   - Set ip and gw manually (Talos VMs don't use cloud-init)")
+    if args.import_blocks:
+        try:
+            path, _ = write_import_blocks(args.type, [(hostname, args.node, args.vmid)])
+        except OSError as e:
+            sys.stderr.write(f"Failed to write {IMPORTS_FILE}: {e}\n")
+            sys.exit(1)
+        print(f"\n2. Plan and apply the import block written to:\n   {path}")
+        print(f"   cd {rc['tf_dir']}")
+        print(f"   terraform plan {var_file_args}")
+        print(f"   terraform apply {var_file_args}")
+        print(f"\n3. Delete {IMPORTS_FILE} once the apply succeeded")
+        print(f"\n{'=' * 60}")
+        return
     print(f"\n2. Run the import:")
     print(f"   cd {rc['tf_dir']}")
     print(f"   {import_cmd}")
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Mock Proxmox VE API for exercising import_proxmox.py without a cluster
+
+Serves the endpoints the import helper uses, backed by synthetic guests or
+a fixture file:
+  GET /api2/json/cluster/resources[?type=vm]
+  GET /api2/json/nodes/{node}/{lxc,qemu}/{vmid}/config
+  GET /api2/json/cluster/tasks
+  GET /api2/json/nodes/{node}/tasks/{upid}/log
+plus GET /_mock/stats (request, connection and per-node concurrency
+counters) so pooling and concurrency limits can be checked from outside.
+
+POST /_mock/tasks {"type": ..., "node": ..., "vmid": ..., "status": ...}
+simulates a finished task for --watch: vzcreate/qmcreate add a new guest,
+vzrestore/qmrestore restore "vmid" (adding it if it doesn't exist),
+vzclone/qmclone clone "vmid" into a new guest (the task's id is the source,
+as in Proxmox; only its log names the new disks); any other type is just
+recorded. The reply is {"upid", "vmid"}. Like Proxmox, /cluster/tasks only
+returns the most recent TASK_HISTORY tasks.
+
+Requests without a PVEAPIToken Authorization header get 401, unknown guests
+404. Latency and failures are injected per request:
+  --latency MS         added to every response
+  --jitter MS          plus a uniform random 0..MS on top
+  --fail-rate F        fraction of config requests answered 500/502/503
+  --throttle-rate F    fraction answered 429 with Retry-After
+  --hang-rate F        fraction stalled for --hang-seconds (client timeouts)
+  --fail-vmids A,B     guests whose config always returns 500
+
+Fixtures: --fixtures FILE serves a JSON list of {"resource": <cluster/resources
+entry>, "config": <guest config>} objects, e.g. captured from a real cluster
+(a missing config digest is computed); --dump-fixtures FILE writes the
+synthetic set in that format and exits.
+
+Usage:
+  python3 mock_proxmox_api.py --guests 500 --nodes 3 --latency 20 --fail-rate 0.05
+  python3 import_proxmox.py --all --dry-run \\
+    --api-url http://127.0.0.1:8006/api2/json \\
+    --api-token-id mock@pve!token --api-token-secret x
+"""
+
+import argparse
+import collections
+import contextlib
+import hashlib
+import json
+import random
+import re
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONFIG_RE = re.compile(r"^/api2/json/nodes/([^/]+)/(lxc|qemu)/(\d+)/config$")
+TASK_LOG_RE = re.compile(r"^/api2/json/nodes/([^/]+)/tasks/([^/]+)/log$")
+
+# Tasks kept for /cluster/tasks
+TASK_HISTORY = 100
+
+# Guest kind a simulated task creates, by task type
+TASK_KINDS = {
+    "vzcreate": "lxc", "vzrestore": "lxc", "vzclone": "lxc",
+    "qmcreate": "qemu", "qmrestore": "qemu", "qmclone": "qemu",
+}
+
+# Share of synthetic guests that are LXC containers (the rest are Talos VMs)
+LXC_SHARE = 0.8
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def _digest(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def synthetic_guests(count, nodes, seed=0):
+    """Generate ``count`` guests spread round-robin over ``nodes``.
+
+    Returns:
+        dict: vmid → {"resource": /cluster/resources entry, "config": guest config}
+    """
+    rng = random.Random(seed)
+    guests = {}
+    for i in range(count):
+        guests[100 + i] = synthetic_guest(100 + i, nodes[i % len(nodes)], rng)
+    return guests
+
+
+def synthetic_guest(vmid, node, rng, kind=None):
+    """One synthetic guest; ``kind`` ('lxc'/'qemu') is random if not given.
+
+    Returns:
+        dict: {"resource": /cluster/resources entry, "config": guest config}
+    """
+    i = vmid - 100
+    mac = "BC:24:11:%02X:%02X:%02X" % (i >> 16 & 255, i >> 8 & 255, i & 255)
+    vlan = rng.choice([10, 20, 30])
+    ip = f"10.{vlan}.{i >> 8 & 255}.{i & 255}"
+    tags = ";".join(sorted(rng.sample(["docker", "prod", "test", "monitoring"], 2)))
+    if kind is None:
+        kind = "lxc" if rng.random() < LXC_SHARE else "qemu"
+    if kind == "lxc":
+        name = f"ct-{vmid}"
+        config = {
+            "hostname": name,
+            "arch": "amd64",
+            "ostype": "debian",
+            "cores": rng.choice([1, 2, 4]),
+            "memory": rng.choice([512, 1024, 2048, 4096]),
+            "swap": 512,
+            "net0": f"name=eth0,bridge=vmbr0,firewall=1,gw=10.{vlan}.0.1,"
+            f"hwaddr={mac},ip={ip}/24,tag={vlan},type=veth",
+            "rootfs": f"local-lvm:vm-{vmid}-disk-0,size={rng.choice([8, 16, 32])}G",
+            "onboot": 1,
+            "unprivileged": 1,
+            "features": "nesting=1",
+            "tags": tags,
+        }
+    else:
+        name = f"talos-{vmid}"
+        config = {
+            "name": name,
+            "bios": "ovmf",
+            "cores": rng.choice([2, 4]),
+            "memory": rng.choice([4096, 6144, 8192]),
+            "net0": f"virtio={mac},bridge=vmbr0,tag={vlan}",
+            "scsi0": f"local-lvm:vm-{vmid}-disk-0,iothread=1,size={rng.choice([32, 64])}G",
+            "efidisk0": f"local-lvm:vm-{vmid}-disk-1,efitype=4m,size=4M",
+            "onboot": 1,
+            "tags": tags,
+        }
+    config["digest"] = _digest(config)
+    resource = {
+        "id": f"{kind}/{vmid}",
+        "type": kind,
+        "vmid": vmid,
+        "node": node,
+        "name": name,
+        "status": "running",
+        "tags": tags,
+        "template": 0,
+        "maxcpu": config["cores"],
+        "maxmem": config["memory"] * 1024 * 1024,
+    }
+    return {"resource": resource, "config": config}
+
+
+def load_fixtures(path):
+    """Read a fixture file (see module docstring) into the synthetic_guests() shape."""
+    with open(path) as f:
+        entries = json.load(f)
+    guests = {}
+    for entry in entries:
+        resource, config = entry["resource"], dict(entry["config"])
+        config.setdefault("digest", _digest(config))
+        guests[int(resource["vmid"])] = {"resource": resource, "config": config}
+    return guests
+
+
+def dump_fixtures(guests, path):
+    """Write ``guests`` as a fixture file load_fixtures() reads back."""
+    with open(path, "w") as f:
+        json.dump([guests[vmid] for vmid in sorted(guests)], f, indent=1)
+        f.write("\n")
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class MockState:
+    """Fixtures, fault injection settings and counters shared by handlers."""
+
+    def __init__(self, guests, latency, fail_rate, throttle_rate, fail_vmids, seed,
+                 jitter=0, hang_rate=0, hang_seconds=60):
+        self.guests = guests
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.throttle_rate = throttle_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.fail_vmids = fail_vmids
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "connections": 0, "status": {}, "max_in_flight": 0}
+        self.in_flight = 0
+        self.node_in_flight = {}
+        self.node_max = {}
+        self.tasks = collections.deque(maxlen=TASK_HISTORY)  # newest first
+        self.task_logs = {}
+        self.task_pid = 0
+
+    def run_task(self, task_type, node, vmid=None, status="OK"):
+        """Record a finished task, adding the guest it creates (see module docstring).
+
+        Returns:
+            tuple: (upid, VMID of the guest the task left behind)
+
+        Raises:
+            KeyError: a clone of an unknown VMID
+        """
+        with self.lock:
+            kind = TASK_KINDS.get(task_type)
+            target, guest, log = vmid, None, []
+            if kind and task_type.endswith("clone"):
+                source = self.guests[vmid]["resource"]
+                target = max(self.guests, default=99) + 1
+                guest = synthetic_guest(target, node, self.rng, source["type"])
+                drive = "mountpoint rootfs" if source["type"] == "lxc" else "drive scsi0"
+                log = [
+                    f"create full clone of {drive} (local-lvm:vm-{vmid}-disk-0)",
+                    f'  Logical volume "vm-{target}-disk-0" created.',
+                ]
+            elif kind and (task_type.endswith("create") or target not in self.guests):
+                if target is None:
+                    target = max(self.guests, default=99) + 1
+                guest = synthetic_guest(target, node, self.rng, kind)
+            if guest and status == "OK":
+                self.guests[target] = guest
+
+            # As in Proxmox, a clone task is about its source guest.
+            subject = vmid if kind and task_type.endswith("clone") else target
+            task_id = "" if subject is None else str(subject)
+            self.task_pid += 1
+            now = int(time.time())
+            upid = f"UPID:{node}:{self.task_pid:08X}:00000000:{now:08X}:{task_type}:{task_id}:root@pam:"
+            if len(self.tasks) == self.tasks.maxlen:
+                self.task_logs.pop(self.tasks[-1]["upid"], None)
+            self.tasks.appendleft({
+                "upid": upid,
+                "node": node,
+                "pid": self.task_pid,
+                "starttime": now,
+                "endtime": now,
+                "type": task_type,
+                "id": task_id,
+                "user": "root@pam",
+                "status": status,
+            })
+            self.task_logs[upid] = log + ["TASK OK" if status == "OK" else f"TASK ERROR: {status}"]
+            return upid, target
+
+    def roll(self):
+        with self.lock:
+            return self.rng.random()
+
+    def enter(self, node):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+            if node:
+                n = self.node_in_flight[node] = self.node_in_flight.get(node, 0) + 1
+                self.node_max[node] = max(self.node_max.get(node, 0), n)
+
+    def leave(self, node, status):
+        with self.lock:
+            self.in_flight -= 1
+            if node:
+                self.node_in_flight[node] -= 1
+            self.stats["status"][str(status)] = self.stats["status"].get(str(status), 0) + 1
+
+    def delay(self):
+        """Seconds to hold the next response: --latency plus 0..--jitter."""
+        if not self.jitter:
+            return self.latency / 1000
+        return (self.latency + self.roll() * self.jitter) / 1000
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, node_max_in_flight=dict(self.node_max))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state = None  # set by serve()
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.stats["connections"] += 1
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status, data=None, headers=()):
+        body = json.dumps({"data": data}).encode() if status == 200 else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def do_GET(self):
+        path, _, _ = self.path.partition("?")
+        if path == "/_mock/stats":
+            self._send(200, self.state.snapshot())
+            return
+        match = CONFIG_RE.match(path)
+        node = match.group(1) if match else None
+        self.state.enter(node)
+        status = 500
+        try:
+            status = self._route(path, match)
+        finally:
+            self.state.leave(node, status)
+
+    def do_POST(self):
+        if self.path != "/_mock/tasks":
+            self._send(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        try:
+            upid, vmid = self.state.run_task(
+                body["type"], body.get("node", "pve"), body.get("vmid"), body.get("status", "OK")
+            )
+        except KeyError:
+            self._send(404)
+            return
+        self._send(200, {"upid": upid, "vmid": vmid})
+
+    def _route(self, path, match):
+        state = self.state
+        delay = state.delay()
+        if delay:
+            time.sleep(delay)
+        if not self.headers.get("Authorization", "").startswith("PVEAPIToken="):
+            return self._send(401)
+        if path == "/api2/json/cluster/resources":
+            with state.lock:
+                return self._send(200, [g["resource"] for g in state.guests.values()])
+        if path == "/api2/json/cluster/tasks":
+            with state.lock:
+                return self._send(200, list(state.tasks))
+        log_match = TASK_LOG_RE.match(path)
+        if log_match:
+            lines = state.task_logs.get(urllib.parse.unquote(log_match.group(2)))
+            if lines is None:
+                return self._send(404)
+            return self._send(200, [{"n": n, "t": t} for n, t in enumerate(lines, 1)])
+        if not match:
+            return self._send(404)
+
+        node, kind, vmid = match.group(1), match.group(2), int(match.group(3))
+        guest = state.guests.get(vmid)
+        if not guest or guest["resource"]["node"] != node or guest["resource"]["type"] != kind:
+            return self._send(404)
+        if vmid in state.fail_vmids:
+            return self._send(500)
+        roll = state.roll()
+        if roll < state.throttle_rate:
+            return self._send(429, headers=[("Retry-After", "0")])
+        if roll < state.throttle_rate + state.fail_rate:
+            return self._send(state.rng.choice([500, 502, 503]))
+        if roll < state.throttle_rate + state.fail_rate + state.hang_rate:
+            # A stuck pveproxy worker: the client has usually given up by now.
+            time.sleep(state.hang_seconds)
+            with contextlib.suppress(OSError):
+                self._send(200, guest["config"])
+            return 200
+        return self._send(200, guest["config"])
+
+
+def make_server(state, host, port, certfile=None, keyfile=None):
+    """Bind a server for ``state``; port 0 picks a free one.
+
+    Returns:
+        tuple: (ThreadingHTTPServer, API base URL)
+    """
+    Handler.state = state
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    scheme = "http"
+    if certfile:
+        ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ctx.load_cert_chain(certfile, keyfile)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    return server, f"{scheme}://{host}:{server.server_address[1]}/api2/json"
+
+
+def serve(state, host, port, certfile=None, keyfile=None):
+    """Serve ``state`` until interrupted."""
+    server, url = make_server(state, host, port, certfile, keyfile)
+    sys.stderr.write(f"Mock Proxmox API with {len(state.guests)} guest(s) on {url}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Proxmox VE API for import_proxmox.py")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8006, help="Port (default: 8006)")
+    parser.add_argument("--guests", type=int, default=50, help="Synthetic guests (default: 50)")
+    parser.add_argument("--nodes", default="pve", help="Comma-separated node names (default: pve)")
+    parser.add_argument("--latency", type=float, default=0, help="Added latency per request in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="Extra random latency of 0..MS per request")
+    parser.add_argument("--fail-rate", type=float, default=0, help="Fraction of config requests failing with 5xx")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="Fraction of config requests answered 429")
+    parser.add_argument("--hang-rate", type=float, default=0, help="Fraction of config requests that stall")
+    parser.add_argument(
+        "--hang-seconds", type=float, default=60, help="How long a stalled request stalls (default: 60)"
+    )
+    parser.add_argument("--fail-vmids", default="", help="Comma-separated VMIDs whose config always fails")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for fixtures and fault injection")
+    parser.add_argument("--fixtures", help="Serve guests from this fixture file instead of synthetic ones")
+    parser.add_argument("--dump-fixtures", metavar="FILE", help="Write the synthetic guests to FILE and exit")
+    parser.add_argument("--tls-cert", help="Serve HTTPS with this certificate (PEM)")
+    parser.add_argument("--tls-key", help="Private key for --tls-cert")
+    args = parser.parse_args()
+
+    nodes = [n for n in args.nodes.split(",") if n]
+    fail_vmids = {int(v) for v in args.fail_vmids.split(",") if v}
+    if args.fixtures:
+        guests = load_fixtures(args.fixtures)
+    else:
+        guests = synthetic_guests(args.guests, nodes, args.seed)
+    if args.dump_fixtures:
+        dump_fixtures(guests, args.dump_fixtures)
+        return
+    state = MockState(
+        guests,
+        args.latency,
+        args.fail_rate,
+        args.throttle_rate,
+        fail_vmids,
+        args.seed,
+        jitter=args.jitter,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+    )
+    serve(state, args.host, args.port, args.tls_cert, args.tls_key)
+
+
+if __name__ == "__main__":
+    main()